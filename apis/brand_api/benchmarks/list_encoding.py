@@ -0,0 +1,62 @@
+"""Size and CPU time of one page of list rows encoded as JSON, MessagePack and CSV, and decoded back.
+
+It seeds (and afterwards drops) its own tables, so only run it against the test database: make bench
+"""
+import csv
+import io
+import time
+from statistics import median
+
+import orjson
+import ormsgpack
+
+from .. import schemas
+from ..crud import read_all_brand_socials_rows, read_all_brands_rows, read_all_users_rows
+from ..db.database import SessionLocal
+from ..utils.rendering import to_csv
+from .seed import PAGE_SIZE, seeded_database
+
+ROUNDS = 200
+
+FORMATS = {
+    "JSON": (lambda model, content: orjson.dumps(content), orjson.loads),
+    "MessagePack": (lambda model, content: ormsgpack.packb(content), ormsgpack.unpackb),
+    "CSV": (to_csv, lambda body: list(csv.DictReader(io.StringIO(body.decode())))),
+}
+
+
+def timed(function, *args) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.process_time()
+        function(*args)
+        timings.append(time.process_time() - start)
+    return median(timings)
+
+
+def main():
+    with seeded_database() as brand_id, SessionLocal() as db:
+        pages = {
+            "ListOfBrands": (schemas.ListOfBrands, {"brands": read_all_brands_rows(db, limit=PAGE_SIZE)}),
+            "ListOfBrandSocials": (
+                schemas.ListOfBrandSocials,
+                {"socials": read_all_brand_socials_rows(db, brand_id, limit=PAGE_SIZE)},
+            ),
+            "ListOfUsers": (schemas.ListOfUsers, {"users": read_all_users_rows(db, limit=PAGE_SIZE)}),
+        }
+        db.close()
+        print(f"Encoding one page of {PAGE_SIZE} rows (median of {ROUNDS})")
+        for name, (model, content) in pages.items():
+            print(f"  {name}")
+            json_size = len(orjson.dumps(content))
+            for label, (encode, decode) in FORMATS.items():
+                body = encode(model, content)
+                print(
+                    f"    {label:<12} {len(body):>7} bytes ({len(body) / json_size:.0%} of JSON)"
+                    f"  encode {timed(encode, model, content) * 1000:.3f} ms"
+                    f"  decode {timed(decode, body) * 1000:.3f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""CPU spent building one page of GET /brands: through the ORM and response_model, through Core rows, and
+rendered by Postgres.
+
+It seeds (and afterwards drops) its own tables, so only run it against the test database: make bench
+"""
+import time
+from statistics import median
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from fastapi.utils import create_response_field
+
+from .. import schemas
+from ..crud import read_all_brands, read_all_brands_document, read_all_brands_rows
+from ..db.database import SessionLocal
+from .seed import PAGE_SIZE, seeded_database
+
+ROUNDS = 50
+
+
+def orm_page(db) -> bytes:
+    # What FastAPI does with the ORM objects: validate against response_model, jsonable_encoder, json.dumps
+    field = create_response_field(name="Response_get_all_brands", type_=schemas.ListOfBrands)
+    value, errors = field.validate({"brands": read_all_brands(db, limit=PAGE_SIZE)}, {}, loc=("response",))
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+def rows_page(db) -> bytes:
+    return ORJSONResponse({"brands": read_all_brands_rows(db, limit=PAGE_SIZE)}).body
+
+
+def document_page(db) -> bytes:
+    return Response(read_all_brands_document(db, limit=PAGE_SIZE), media_type="application/json").body
+
+
+def measure(page) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        with SessionLocal() as db:
+            start = time.process_time()
+            page(db)
+            timings.append(time.process_time() - start)
+    return median(timings)
+
+
+def main():
+    with seeded_database():
+        before = measure(orm_page)
+        print(f"CPU per {PAGE_SIZE} brands page (median of {ROUNDS})")
+        print(f"  ORM + response_model: {before * 1000:.2f} ms")
+        for label, page in [("Core rows + orjson:  ", rows_page), ("Rendered by Postgres:", document_page)]:
+            after = measure(page)
+            print(f"  {label} {after * 1000:.2f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Size and CPU time of one page of GET /brands with the audit users embedded in every row, and sideloaded
+once under `included`.
+
+It seeds (and afterwards drops) its own tables, so only run it against the test database: make bench
+"""
+import time
+from statistics import median
+
+import orjson
+
+from ..crud import read_all_brands_rows, read_included_users
+from ..db.database import SessionLocal
+from .seed import PAGE_SIZE, seeded_database
+
+ROUNDS = 50
+
+
+def embedded_page(db) -> bytes:
+    return orjson.dumps({"brands": read_all_brands_rows(db, limit=PAGE_SIZE)})
+
+
+def sideloaded_page(db) -> bytes:
+    brands = read_all_brands_rows(db, limit=PAGE_SIZE, sideload_users=True)
+    return orjson.dumps({"brands": brands, "included": {"users": read_included_users(db, brands)}})
+
+
+def measure(page) -> tuple[int, float]:
+    timings = []
+    for _ in range(ROUNDS):
+        with SessionLocal() as db:
+            start = time.process_time()
+            body = page(db)
+            timings.append(time.process_time() - start)
+    return len(body), median(timings)
+
+
+def main():
+    with seeded_database():
+        print(f"{PAGE_SIZE} brands page, bytes and CPU (median of {ROUNDS})")
+        before_size, before = measure(embedded_page)
+        print(f"  Embedded users:   {before_size:>7} B {before * 1000:.2f} ms")
+        after_size, after = measure(sideloaded_page)
+        print(
+            f"  Sideloaded users: {after_size:>7} B {after * 1000:.2f} ms"
+            f" ({before_size / after_size:.1f}x smaller, {before / after:.1f}x faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
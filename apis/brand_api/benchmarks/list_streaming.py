@@ -0,0 +1,49 @@
+"""Peak Python memory of encoding GET /brands pages of growing size whole, and streamed from a server side cursor.
+
+It seeds (and afterwards drops) its own tables, so only run it against the test database: make bench
+"""
+import tracemalloc
+
+import orjson
+
+from ..crud import read_all_brands_rows
+from ..db.database import SessionLocal
+from ..utils.rendering import STREAM_YIELD_PER, _stream_json
+from .seed import seeded_database
+
+PAGE_SIZES = [1000, 5000, 20000]
+
+
+def whole_page(db, limit: int) -> int:
+    return len(orjson.dumps({"brands": read_all_brands_rows(db, limit=limit)}))
+
+
+def streamed_page(db, limit: int) -> int:
+    return sum(
+        len(chunk)
+        for chunk in _stream_json("brands", read_all_brands_rows(db, limit=limit, yield_per=STREAM_YIELD_PER))
+    )
+
+
+def peak(page, limit: int) -> tuple[int, int]:
+    with SessionLocal() as db:
+        tracemalloc.start()
+        size = page(db, limit)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return size, peak_memory
+
+
+def main():
+    with seeded_database(max(PAGE_SIZES)):
+        print("Peak traced memory per page")
+        for limit in PAGE_SIZES:
+            size, whole = peak(whole_page, limit)
+            _, streamed = peak(streamed_page, limit)
+            print(
+                f"  {limit:>6} brands, {size / 1e6:5.1f} MB body: whole {whole / 1e6:6.1f} MB, streamed {streamed / 1e6:4.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
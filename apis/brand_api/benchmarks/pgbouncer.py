@@ -0,0 +1,85 @@
+"""Throughput of GET /brands pages as the worker processes grow, connected to Postgres directly and through PgBouncer.
+
+Directly, every worker keeps its share of DB_MAX_CONNECTIONS in its pool, as serve.py sizes it. Through PgBouncer
+(PGBOUNCER_DATABASE_URL) the workers keep no pool and PgBouncer shares its server connections between them. Every
+worker runs THREADS threads, each reading pages one after the other for DURATION seconds.
+
+It seeds (and afterwards drops) its own tables, so only run it against the test database: make bench
+"""
+import os
+import subprocess
+import sys
+
+from ..serve import pool_size
+from .seed import PAGE_SIZE, seeded_database
+
+WORKERS = [1, 2, 4, 8, 16]
+THREADS = 20
+DURATION = 5
+
+SCRIPT = f"""
+import threading
+import time
+
+from apis.brand_api.crud import read_all_brands_rows
+from apis.brand_api.db.database import session_for
+
+pages = []
+
+
+def read_pages(until):
+    while time.perf_counter() < until:
+        with session_for("GET") as db:
+            read_all_brands_rows(db, limit={PAGE_SIZE})
+        pages.append(1)
+
+
+until = time.perf_counter() + {DURATION}
+threads = [threading.Thread(target=read_pages, args=(until,)) for _ in range({THREADS})]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(len(pages))
+"""
+
+
+def direct(workers: int) -> dict:
+    return {"DB_POOL_SIZE": str(pool_size(workers)), "DB_MAX_OVERFLOW": "0"}
+
+
+def pgbouncer(workers: int) -> dict:
+    return {"SQLALCHEMY_DATABASE_URL": os.environ["PGBOUNCER_DATABASE_URL"], "DB_PGBOUNCER": "true"}
+
+
+def throughput(workers: int, environment: dict) -> float:
+    """Pages read per second by `workers` processes running at once."""
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", SCRIPT], env=os.environ | environment, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(workers)
+    ]
+    pages = 0
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        pages += int(output.split()[-1])
+    return pages / DURATION
+
+
+def main():
+    modes = {"direct": direct}
+    if os.getenv("PGBOUNCER_DATABASE_URL"):
+        modes["pgbouncer"] = pgbouncer
+    with seeded_database():
+        print(f"{PAGE_SIZE} brands pages per second, {THREADS} threads per worker")
+        print(f"  {'workers':>7}" + "".join(f"{mode:>11}" for mode in modes))
+        for workers in WORKERS:
+            pages = [throughput(workers, mode(workers)) for mode in modes.values()]
+            print(f"  {workers:>7}" + "".join(f"{rate:>11.0f}" for rate in pages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Insert throughput, primary key index size and WAL written when loading ROWS rows keyed by random UUIDv4s, and by
+time-ordered UUIDv7s.
+
+Random keys land anywhere in the index, so every page of it keeps being split and written again, time-ordered ones
+are appended to its right edge. It creates (and afterwards drops) tables of its own, so only run it against the test
+database: make bench
+"""
+import time
+from uuid import uuid4
+
+from sqlalchemy import Column, MetaData, Table, Text, func, insert, select
+from sqlalchemy.dialects.postgresql import UUID
+
+from ..db.database import engine
+from ..db.models import uuid7
+
+ROWS = 2_000_000
+BATCH = 10_000
+
+
+def load(table: Table, new_id) -> tuple[float, int, int]:
+    """Rows inserted per second, the size of the primary key index and the WAL written, in bytes."""
+    with engine.connect() as connection:
+        wal_start = connection.execute(select(func.pg_current_wal_lsn())).scalar()
+    start = time.perf_counter()
+    for batch in range(0, ROWS, BATCH):
+        with engine.begin() as connection:
+            connection.execute(insert(table), [{"id": new_id(), "name": f"benchBrand{i}"} for i in range(BATCH)])
+    duration = time.perf_counter() - start
+    with engine.connect() as connection:
+        wal = connection.execute(select(func.pg_wal_lsn_diff(func.pg_current_wal_lsn(), wal_start))).scalar()
+        index_size = connection.execute(select(func.pg_relation_size(f"{table.name}_pkey"))).scalar()
+    return ROWS / duration, index_size, int(wal)
+
+
+def main():
+    metadata = MetaData()
+    tables = {
+        version: Table(f"bench_{version}_keys", metadata, Column("id", UUID, primary_key=True), Column("name", Text))
+        for version in ["uuid4", "uuid7"]
+    }
+    metadata.create_all(engine)
+    try:
+        print(f"Loading {ROWS:,} rows, {BATCH:,} per transaction")
+        for (version, table), new_id in zip(tables.items(), [uuid4, uuid7]):
+            rate, index_size, wal = load(table, new_id)
+            print(f"  {version}: {rate:8,.0f} rows/s, primary key {index_size / 1e6:6.1f} MB, WAL {wal / 1e6:7.1f} MB")
+    finally:
+        metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Round trips and wall time of reading one page of GET /brands in a read write transaction, as every GET did, and
+in the read only autocommit session GETs get now.
+
+psycopg2 sends a BEGIN before the first statement of a transaction, and the pool a ROLLBACK when the connection is
+given back, so every read write session costs two round trips more than the statements it runs. On a local socket
+those are almost free, across a network every GET saves twice its latency to the database.
+
+It seeds (and afterwards drops) its own tables, so only run it against the test database: make bench
+"""
+import time
+from statistics import median
+
+from sqlalchemy import event
+
+from ..crud import read_all_brands_rows
+from ..db.database import SessionLocal, engine, session_for
+from .seed import PAGE_SIZE, seeded_database
+
+ROUNDS = 200
+
+
+def measure(session) -> tuple[int, float]:
+    statements = 0
+    transactions = set()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+        if not conn.connection.dbapi_connection.autocommit:
+            transactions.add(id(conn.connection.dbapi_connection))
+
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    timings = []
+    try:
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            with session() as db:
+                read_all_brands_rows(db, limit=PAGE_SIZE)
+            timings.append(time.perf_counter() - start)
+            round_trips = statements + 2 * len(transactions)
+            statements = 0
+            transactions.clear()
+    finally:
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
+    return round_trips, median(timings)
+
+
+def main():
+    with seeded_database():
+        print(f"{PAGE_SIZE} brands page, round trips and wall time (median of {ROUNDS})")
+        before_trips, before = measure(SessionLocal)
+        print(f"  Read write transaction: {before_trips} round trips {before * 1000:.2f} ms")
+        after_trips, after = measure(lambda: session_for("GET"))
+        print(
+            f"  Read only autocommit:   {after_trips} round trips {after * 1000:.2f} ms"
+            f" ({before_trips - after_trips} fewer, {before / after:.2f}x faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+from contextlib import contextmanager
+
+from ..db.database import SessionLocal, engine
+from ..db.models import Base, Brand, BrandSocial, Category, Social, User
+
+PAGE_SIZE = 100
+
+
+def seed(db, page_size: int = PAGE_SIZE):
+    """A page worth of users, brands and socials of the first brand, touched by a handful of editors."""
+    users = [User(username=f"benchUser{i}", password="not-a-hash") for i in range(page_size)]
+    db.add_all(users)
+    db.flush()
+    editors = users[:3]
+    categories = [Category(name=f"benchCategory{i}", created_by_id=editors[0].id) for i in range(5)]
+    socials = [Social(name=f"benchSocial{i}") for i in range(5)]
+    db.add_all(categories + socials)
+    db.flush()
+    brands = [
+        Brand(
+            name=f"benchBrand{i}",
+            category_id=categories[i % len(categories)].id,
+            description="A brand made in Portugal",
+            average_price="medium",
+            city="Porto",
+            postal_code="4400-300",
+            created_by_id=editors[i % len(editors)].id,
+            updated_by_id=editors[(i + 1) % len(editors)].id,
+        )
+        for i in range(page_size)
+    ]
+    db.add_all(brands)
+    db.flush()
+    db.add_all(
+        BrandSocial(
+            brand_id=brands[0].id,
+            social_id=socials[i % len(socials)].id,
+            address=f"www.benchbrand{i}.pt",
+            created_by_id=editors[i % len(editors)].id,
+        )
+        for i in range(page_size)
+    )
+    db.commit()
+    return brands[0].id
+
+
+@contextmanager
+def seeded_database(page_size: int = PAGE_SIZE):
+    """Create and seed the tables, yielding the id of the brand that has socials, then drop them all."""
+    if os.getenv("ENVIRONMENT") != "test":
+        raise SystemExit("The benchmarks drop every table when they finish, run them with ENVIRONMENT=test.")
+    Base.metadata.create_all(engine)
+    try:
+        with SessionLocal() as db:
+            yield seed(db, page_size)
+    finally:
+        Base.metadata.drop_all(engine)
@@ -0,0 +1,52 @@
+"""Time from a cold interpreter to the first response: importing the app, running its lifespan, then GET /brands.
+
+Every run is a fresh process, so nothing is already imported or cached. The lifespan creates the tables, so only run
+it against the test database, it drops them afterwards: make bench
+"""
+import statistics
+import subprocess
+import sys
+
+from ..db.database import engine
+from ..db.models import Base
+
+RUNS = 5
+
+SCRIPT = """
+import time
+
+from fastapi.testclient import TestClient
+
+start = time.perf_counter()
+from apis.brand_api.main import app
+
+imported = time.perf_counter()
+with TestClient(app) as client:
+    started = time.perf_counter()
+    assert client.get("/brands/").status_code == 200
+    responded = time.perf_counter()
+print(imported - start, started - imported, responded - started)
+"""
+
+
+def run() -> tuple[float, float, float]:
+    output = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, check=True, text=True).stdout
+    imported, started, responded = (float(value) for value in output.split()[-3:])
+    return imported, started, responded
+
+
+def main():
+    try:
+        runs = [run() for _ in range(RUNS)]
+    finally:
+        Base.metadata.drop_all(engine)
+    imported, started, responded = (statistics.median(times) * 1000 for times in zip(*runs))
+    print(f"Median of {RUNS} cold starts")
+    print(f"  import       {imported:6.0f} ms")
+    print(f"  lifespan     {started:6.0f} ms")
+    print(f"  first GET    {responded:6.0f} ms")
+    print(f"  total        {imported + started + responded:6.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
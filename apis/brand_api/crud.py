@@ -1,14 +1,163 @@
+import json
+from collections.abc import Iterator
 from datetime import datetime
+from functools import lru_cache
 from uuid import UUID
 
-from sqlalchemy import asc, desc, or_, select
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Text,
+    asc,
+    bindparam,
+    case,
+    cast,
+    column,
+    desc,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import Session, aliased, selectinload
 
 from . import schemas
-from .db.models import Brand, BrandSocial, Category, Social, User
+from .db.models import AveragePrice, Brand, BrandSocial, Category, Role, Social, User
 from .utils.logging import logger
 
 
+def _user_row(user_id: UUID | None, username: str | None) -> dict | None:
+    return None if user_id is None else {"id": user_id, "username": username, "info": None}
+
+
+def _audit_select(stmt, model, with_created_by: bool = True, sideload_users: bool = False):
+    """Add the audit columns (and the users behind them, unless sideloaded) of `model` to a Core select."""
+    columns = []
+    for field in ["created_by", "updated_by", "deleted_by"] if with_created_by else ["updated_by", "deleted_by"]:
+        if sideload_users:
+            columns.append(getattr(model, f"{field}_id"))
+            continue
+        user = aliased(User, name=field)
+        columns += [user.id.label(f"{field}_id"), user.username.label(f"{field}_username")]
+        stmt = stmt.outerjoin(user, getattr(model, f"{field}_id") == user.id)
+    return stmt.add_columns(model.created_at, model.updated_at, model.deleted_at, *columns)
+
+
+def _audit_row(row, with_created_by: bool = True, sideload_users: bool = False) -> dict:
+    audit = {}
+    for action in ["created", "updated", "deleted"]:
+        audit[f"{action}_at"] = getattr(row, f"{action}_at")
+        if action == "created" and not with_created_by:
+            continue
+        user_id = getattr(row, f"{action}_by_id")
+        if sideload_users:
+            audit[f"{action}_by_id"] = user_id
+        else:
+            audit[f"{action}_by"] = _user_row(user_id, getattr(row, f"{action}_by_username"))
+    return audit
+
+
+def _rows(db: Session, stmt, shape, yield_per: int | None = None) -> list[dict] | Iterator[dict]:
+    """`stmt` rows passed through `shape`, as a list or, with yield_per, lazily fetched that many at a time
+    from a server side cursor."""
+    if yield_per is None:
+        return [shape(row) for row in db.execute(stmt)]
+    return (shape(row) for row in db.execute(stmt.execution_options(yield_per=yield_per)))
+
+
+def read_included_users(db: Session, rows: list[dict]) -> dict[str, dict]:
+    """The users referenced by sideloaded rows, keyed by id and loaded with a single query."""
+    user_ids = {row[key] for row in rows for key in ["created_by_id", "updated_by_id", "deleted_by_id"] if row.get(key)}
+    if not user_ids:
+        return {}
+    return {
+        str(user.id): _user_row(user.id, user.username)
+        for user in db.execute(select(User.id, User.username).where(User.id.in_(user_ids)))
+    }
+
+
+# The helpers below build JSON as text inside Postgres. json_build_object and json_agg pad their output
+# with spaces and to_json trims trailing zeros from microseconds, so the documents are concatenated by
+# hand to stay byte for byte what FastAPI would send for the same response_model.
+_ISO_SECONDS = 'YYYY-MM-DD"T"HH24:MI:SS'
+
+
+def _json(column):
+    return func.coalesce(cast(func.to_json(column), Text), "null")
+
+
+def _json_timestamp(column):
+    return case(
+        (column == None, "null"),
+        (func.date_trunc("second", column) == column, func.concat('"', func.to_char(column, _ISO_SECONDS), '"')),
+        else_=func.concat('"', func.to_char(column, _ISO_SECONDS + ".US"), '"'),
+    )
+
+
+def _json_average_price(column):
+    return case({member.name: str(member.value) for member in AveragePrice}, value=column, else_="null")
+
+
+def _json_object(fields: dict):
+    parts = []
+    for position, (key, value) in enumerate(fields.items()):
+        parts += [("{" if position == 0 else ",") + json.dumps(key) + ":", value]
+    return func.concat(*parts, "}")
+
+
+def _json_user(user):
+    return case(
+        (user.id == None, "null"),
+        else_=_json_object({"id": _json(user.id), "username": _json(user.username), "info": "null"}),
+    )
+
+
+def _json_audit(stmt, model, with_created_by: bool = True):
+    """Join the users behind the audit columns of `model`, and return their JSON fields."""
+    fields = {"created_at": _json_timestamp(model.created_at)}
+    for field in ["created_by", "updated_by", "deleted_by"] if with_created_by else ["updated_by", "deleted_by"]:
+        user = aliased(User, name=field)
+        stmt = stmt.outerjoin(user, getattr(model, f"{field}_id") == user.id)
+        fields[field] = _json_user(user)
+    fields = {
+        "created_at": fields["created_at"],
+        **({"created_by": fields["created_by"]} if with_created_by else {}),
+        "updated_at": _json_timestamp(model.updated_at),
+        "updated_by": fields["updated_by"],
+        "deleted_at": _json_timestamp(model.deleted_at),
+        "deleted_by": fields["deleted_by"],
+    }
+    return stmt, fields
+
+
+def _json_document(key: str, stmt, document, ordering):
+    """Aggregate one page (the skip and limit parameters) of `document` rows into the {key: [...]} body."""
+    page = (
+        stmt.add_columns(document.label("document"), func.row_number().over(order_by=ordering).label("position"))
+        .order_by("position")
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+        .subquery()
+    )
+    documents = func.string_agg(page.c.document, aggregate_order_by(literal(","), page.c.position))
+    return select(func.concat("{" + json.dumps(key) + ":[", func.coalesce(documents, ""), "]}"))
+
+
+@lru_cache
+def _compile_document(dialect, build_statement, *args) -> tuple[str, dict]:
+    compiled = build_statement(*args).compile(dialect=dialect)
+    return compiled.string, compiled.params
+
+
+def _read_document(db: Session, build_statement, *args, **params) -> bytes:
+    # The statements are large and only their parameters change between requests, so they are built and
+    # compiled once and run straight on the driver, which keeps Python out of the way almost entirely.
+    sql, constants = _compile_document(db.get_bind().dialect, build_statement, *args)
+    return db.connection().exec_driver_sql(sql, {**constants, **params}).scalar().encode()
+
+
 def create_brand(db: Session, brand: schemas.BrandsPostBody, user_id: UUID) -> Brand:
     db_brand = Brand(**brand.dict(), created_by_id=user_id)
     db.add(db_brand)
@@ -46,6 +195,60 @@ def read_all_brands(
     return db.scalars(basequery.where(*filter_list).offset(skip).limit(limit)).all()
 
 
+def upsert_brands(db: Session, brands: list[dict], user_id: UUID) -> list[tuple[Brand, schemas.UpsertStatus]]:
+    """Insert or update brands by name with a single INSERT ... ON CONFLICT (name) DO UPDATE.
+
+    Rows whose values would not change are left alone by the conflict WHERE clause, so they are
+    not returned by RETURNING and get reported as unchanged. Soft deleted brands are restored.
+    """
+    now = datetime.now()
+    # On the table rather than the model, SQLAlchemy before 2.0.20 has no ORM bulk INSERT with a RETURNING like this
+    brands_table = Brand.__table__
+    stmt = insert(brands_table).values([{**brand, "created_by_id": user_id} for brand in brands])
+    columns = [column for column in brands[0].keys() if column != "name"]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[brands_table.c.name],
+        set_={
+            **{column: stmt.excluded[column] for column in columns},
+            "updated_at": now,
+            "updated_by_id": user_id,
+            "deleted_at": None,
+            "deleted_by_id": None,
+        },
+        where=or_(
+            brands_table.c.deleted_at != None,
+            *[brands_table.c[column].is_distinct_from(stmt.excluded[column]) for column in columns],
+        ),
+    ).returning(brands_table.c.name, (literal_column("xmax") == 0).label("inserted"))
+    written = {row.name: row.inserted for row in db.execute(stmt)}
+    db.commit()
+    names = [brand["name"] for brand in brands]
+    brands_by_name = {
+        brand.name: brand
+        for brand in db.scalars(
+            select(Brand)
+            .where(Brand.name.in_(names))
+            .options(
+                selectinload(Brand.category),
+                selectinload(Brand.created_by),
+                selectinload(Brand.updated_by),
+                selectinload(Brand.deleted_by),
+            )
+        ).all()
+    }
+    return [
+        (
+            brands_by_name[name],
+            schemas.UpsertStatus.unchanged
+            if name not in written
+            else schemas.UpsertStatus.inserted
+            if written[name]
+            else schemas.UpsertStatus.updated,
+        )
+        for name in names
+    ]
+
+
 def update_brand(db: Session, brand) -> Brand:
     db.add(brand)
     db.commit()
@@ -53,6 +256,160 @@ def update_brand(db: Session, brand) -> Brand:
     return brand
 
 
+def read_all_brands_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    show_deleted: bool = False,
+    order_by: str = "created_at",
+    direction: str = "asc",
+    category_id: UUID = None,
+    sideload_users: bool = False,
+    yield_per: int | None = None,
+) -> list[dict] | Iterator[dict]:
+    """Same as read_all_brands, but as plain rows already shaped like schemas.BrandsResponse.
+
+    With sideload_users the rows are shaped like schemas.BrandsSideloadedResponse instead, and with yield_per
+    they are streamed from a server side cursor instead of being read all at once.
+    """
+    filter_list = [
+        or_(Brand.deleted_at == None, Brand.deleted_at != None) if show_deleted else Brand.deleted_at == None
+    ]
+    if not category_id == None:
+        filter_list.append(Brand.category_id == category_id)
+    stmt = select(
+        Brand.id,
+        Brand.name,
+        Category.id.label("category_id"),
+        Category.name.label("category_name"),
+        Brand.description,
+        Brand.average_price,
+        Brand.line_address_1,
+        Brand.line_address_2,
+        Brand.city,
+        Brand.postal_code,
+    ).join(Category, Brand.category_id == Category.id)
+    order_column = getattr(Brand, order_by)
+    stmt = (
+        _audit_select(stmt, Brand, sideload_users=sideload_users)
+        .where(*filter_list)
+        .order_by(asc(order_column) if direction == "asc" else desc(order_column))
+        .offset(skip)
+        .limit(limit)
+    )
+    return _rows(
+        db,
+        stmt,
+        lambda row: {
+            "id": row.id,
+            "name": row.name,
+            "category": {"id": row.category_id, "name": row.category_name},
+            "description": row.description,
+            "average_price": row.average_price,
+            "line_address_1": row.line_address_1,
+            "line_address_2": row.line_address_2,
+            "city": row.city,
+            "postal_code": row.postal_code,
+            **_audit_row(row, sideload_users=sideload_users),
+        },
+        yield_per,
+    )
+
+
+def _brands_document_statement(order_by: str, direction: str):
+    stmt, audit = _json_audit(select().select_from(Brand).join(Category, Brand.category_id == Category.id), Brand)
+    document = _json_object(
+        {
+            "id": _json(Brand.id),
+            "name": _json(Brand.name),
+            "category": _json_object({"id": _json(Category.id), "name": _json(Category.name)}),
+            "description": _json(Brand.description),
+            "average_price": _json_average_price(Brand.average_price),
+            "line_address_1": _json(Brand.line_address_1),
+            "line_address_2": _json(Brand.line_address_2),
+            "city": _json(Brand.city),
+            "postal_code": _json(Brand.postal_code),
+            **audit,
+        }
+    )
+    stmt = stmt.where(
+        or_(bindparam("show_deleted"), Brand.deleted_at == None),
+        or_(bindparam("category_id") == None, Brand.category_id == bindparam("category_id")),
+    )
+    order_column = getattr(Brand, order_by)
+    ordering = asc(order_column) if direction == "asc" else desc(order_column)
+    return _json_document("brands", stmt, document, ordering)
+
+
+def read_all_brands_document(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    show_deleted: bool = False,
+    order_by: str = "created_at",
+    direction: str = "asc",
+    category_id: UUID = None,
+) -> bytes:
+    """Same as read_all_brands, but with Postgres rendering the whole schemas.ListOfBrands JSON body."""
+    return _read_document(
+        db,
+        _brands_document_statement,
+        order_by,
+        direction,
+        skip=skip,
+        limit=limit,
+        show_deleted=show_deleted,
+        category_id=None if category_id is None else str(category_id),
+    )
+
+
+def _bulk_update(db: Session, model, changes: list[dict], *filters) -> list[UUID] | None:
+    """Apply a list of {"id": ..., **values} changes with one UPDATE ... FROM (VALUES ...) per distinct set of
+    changed columns.
+
+    Everything runs in a single transaction, and it is rolled back if any of the ids was not
+    affected (missing or soft deleted), in which case None is returned.
+    """
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for change in changes:
+        groups.setdefault(tuple(sorted(key for key in change if key != "id")), []).append(change)
+    table = model.__table__
+    affected_ids = []
+    for keys, group in groups.items():
+        rows = values(*[column(key, table.c[key].type) for key in ["id", *keys]], name="changes").data(
+            [tuple(change[key] for key in ["id", *keys]) for change in group]
+        )
+        affected_ids += db.scalars(
+            update(model)
+            .where(model.id == rows.c.id, model.deleted_at == None, *filters)
+            .values({key: cast(rows.c[key], table.c[key].type) for key in keys})
+            .returning(model.id)
+        ).all()
+    if len(affected_ids) != len(changes):
+        db.rollback()
+        return None
+    db.commit()
+    return affected_ids
+
+
+def bulk_update_brands(db: Session, changes: list[dict]) -> list[Brand] | None:
+    affected_ids = _bulk_update(db, Brand, changes)
+    if affected_ids is None:
+        return None
+    brands = db.scalars(
+        select(Brand)
+        .where(Brand.id.in_(affected_ids))
+        .options(
+            selectinload(Brand.category),
+            selectinload(Brand.created_by),
+            selectinload(Brand.updated_by),
+            selectinload(Brand.deleted_by),
+        )
+    ).all()
+    brands_by_id = {brand.id: brand for brand in brands}
+    return [brands_by_id[change["id"]] for change in changes]
+
+
 def create_category(db: Session, category: schemas.CategoriesPostBody, user_id: UUID) -> Category:
     db_category = Category(
         **category.dict(),
@@ -85,6 +442,74 @@ def read_all_categories(
     ).all()
 
 
+def read_all_categories_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    show_deleted: bool = False,
+    order_by: str = "created_at",
+    direction: str = "asc",
+    sideload_users: bool = False,
+    yield_per: int | None = None,
+) -> list[dict] | Iterator[dict]:
+    """Same as read_all_categories, but as plain rows already shaped like schemas.CategoriesResponse.
+
+    With sideload_users the rows are shaped like schemas.CategoriesSideloadedResponse instead, and with
+    yield_per they are streamed from a server side cursor instead of being read all at once.
+    """
+    order_column = getattr(Category, order_by)
+    stmt = (
+        _audit_select(select(Category.id, Category.name), Category, sideload_users=sideload_users)
+        .where(
+            or_(Category.deleted_at == None, Category.deleted_at != None)
+            if show_deleted
+            else Category.deleted_at == None
+        )
+        .order_by(asc(order_column) if direction == "asc" else desc(order_column))
+        .offset(skip)
+        .limit(limit)
+    )
+    return _rows(
+        db,
+        stmt,
+        lambda row: {"id": row.id, "name": row.name, **_audit_row(row, sideload_users=sideload_users)},
+        yield_per,
+    )
+
+
+def _categories_document_statement(order_by: str, direction: str):
+    stmt, audit = _json_audit(select().select_from(Category), Category)
+    document = _json_object({"id": _json(Category.id), "name": _json(Category.name), **audit})
+    stmt = stmt.where(or_(bindparam("show_deleted"), Category.deleted_at == None))
+    order_column = getattr(Category, order_by)
+    ordering = asc(order_column) if direction == "asc" else desc(order_column)
+    return _json_document("categories", stmt, document, ordering)
+
+
+def read_all_categories_document(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    show_deleted: bool = False,
+    order_by: str = "created_at",
+    direction: str = "asc",
+) -> bytes:
+    """Same as read_all_categories, but with Postgres rendering the whole schemas.ListOfCategories JSON body."""
+    return _read_document(
+        db,
+        _categories_document_statement,
+        order_by,
+        direction,
+        skip=skip,
+        limit=limit,
+        show_deleted=show_deleted,
+    )
+
+
+def read_category_ids(db: Session, category_ids: set[UUID]) -> set[UUID]:
+    return set(db.scalars(select(Category.id).where(Category.id.in_(category_ids), Category.deleted_at == None)).all())
+
+
 def read_category(db: Session, param, show_deleted: bool = False) -> Category:
     filtering_param = list(param.keys())[0]
     return db.scalars(
@@ -121,6 +546,10 @@ def read_user(db: Session, param: dict[str, str | UUID], show_deleted: bool = Fa
     ).first()
 
 
+def read_role_name(db: Session, user_id: UUID) -> str | None:
+    return db.scalar(select(Role.name).join(User, User.role_id == Role.id).where(User.id == user_id))
+
+
 def create_user(db: Session, user) -> dict[str, str]:
     db_user = User(username=user["username"], email=user["email"], password=user["password"], created_at=datetime.now())
     db.add(db_user)
@@ -146,6 +575,35 @@ def read_all_users(
     ).all()
 
 
+def read_all_users_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    show_deleted: bool = False,
+    order_by: str = "created_at",
+    direction: str = "asc",
+    yield_per: int | None = None,
+) -> list[dict] | Iterator[dict]:
+    """Same as read_all_users, but as plain rows already shaped like schemas.UserResponse.
+
+    With yield_per they are streamed from a server side cursor instead of being read all at once.
+    """
+    order_column = getattr(User, order_by)
+    stmt = (
+        _audit_select(select(User.id, User.username), User, with_created_by=False)
+        .where(or_(User.deleted_at == None, User.deleted_at != None) if show_deleted else User.deleted_at == None)
+        .order_by(asc(order_column) if direction == "asc" else desc(order_column))
+        .offset(skip)
+        .limit(limit)
+    )
+    return _rows(
+        db,
+        stmt,
+        lambda row: {"id": row.id, "username": row.username, "info": None, **_audit_row(row, with_created_by=False)},
+        yield_per,
+    )
+
+
 def read_social(db: Session, param: dict[str, str | UUID]) -> Social:
     filtering_param = list(param.keys())[0]
     return db.scalars(
@@ -153,6 +611,10 @@ def read_social(db: Session, param: dict[str, str | UUID]) -> Social:
     ).first()
 
 
+def read_social_ids(db: Session, social_ids: set[UUID]) -> set[UUID]:
+    return set(db.scalars(select(Social.id).where(Social.id.in_(social_ids))).all())
+
+
 def create_social(db: Session, social: schemas.SocialsPostBody) -> Social:
     db_social = Social(**social.dict())
     db.add(db_social)
@@ -165,6 +627,17 @@ def read_all_socials(db: Session, skip: int = 0, limit: int = 100) -> list[Socia
     return db.scalars(select(Social).offset(skip).limit(limit)).all()
 
 
+def read_all_socials_rows(
+    db: Session, skip: int = 0, limit: int = 100, yield_per: int | None = None
+) -> list[dict] | Iterator[dict]:
+    """Same as read_all_socials, but as plain rows already shaped like schemas.SocialsBase.
+
+    With yield_per they are streamed from a server side cursor instead of being read all at once.
+    """
+    stmt = select(Social.id, Social.name).offset(skip).limit(limit)
+    return _rows(db, stmt, lambda row: {"id": row.id, "name": row.name}, yield_per)
+
+
 def create_brand_social(
     db: Session, brandsocial: schemas.BrandSocialsPostBody, brand_id: UUID, user_id: UUID
 ) -> BrandSocial:
@@ -191,6 +664,76 @@ def read_all_brand_socials(
     ).all()
 
 
+def read_all_brand_socials_rows(
+    db: Session,
+    brand_id: UUID,
+    skip: int = 0,
+    limit: int = 100,
+    show_deleted: bool = False,
+    sideload_users: bool = False,
+    yield_per: int | None = None,
+) -> list[dict] | Iterator[dict]:
+    """Same as read_all_brand_socials, but as plain rows already shaped like schemas.BrandSocialsResponse.
+
+    With sideload_users the rows are shaped like schemas.BrandSocialsSideloadedResponse instead, and with
+    yield_per they are streamed from a server side cursor instead of being read all at once.
+    """
+    stmt = (
+        select(
+            BrandSocial.id,
+            Brand.id.label("brand_id"),
+            Brand.name.label("brand_name"),
+            Category.id.label("category_id"),
+            Category.name.label("category_name"),
+            Brand.description,
+            Brand.average_price,
+            Brand.line_address_1,
+            Brand.line_address_2,
+            Brand.city,
+            Brand.postal_code,
+            Social.id.label("social_id"),
+            Social.name.label("social_name"),
+            BrandSocial.address,
+        )
+        .join(Brand, BrandSocial.brand_id == Brand.id)
+        .join(Category, Brand.category_id == Category.id)
+        .join(Social, BrandSocial.social_id == Social.id)
+    )
+    stmt = (
+        _audit_select(stmt, BrandSocial, sideload_users=sideload_users)
+        .where(
+            BrandSocial.brand_id == brand_id,
+            or_(BrandSocial.deleted_at == None, BrandSocial.deleted_at != None)
+            if show_deleted
+            else BrandSocial.deleted_at == None,
+        )
+        .offset(skip)
+        .limit(limit)
+    )
+    return _rows(
+        db,
+        stmt,
+        lambda row: {
+            "id": row.id,
+            "brand": {
+                "id": row.brand_id,
+                "name": row.brand_name,
+                "category": {"id": row.category_id, "name": row.category_name},
+                "description": row.description,
+                "average_price": row.average_price,
+                "line_address_1": row.line_address_1,
+                "line_address_2": row.line_address_2,
+                "city": row.city,
+                "postal_code": row.postal_code,
+            },
+            "social": {"id": row.social_id, "name": row.social_name},
+            "address": row.address,
+            **_audit_row(row, sideload_users=sideload_users),
+        },
+        yield_per,
+    )
+
+
 def read_brand_socials(db: Session, brand_socials_id: UUID, show_deleted: bool = False) -> list[BrandSocial]:
     return db.scalars(
         select(BrandSocial).where(
@@ -207,3 +750,22 @@ def update_brand_socials(db: Session, brand_socials) -> BrandSocial:
     db.commit()
     db.refresh(brand_socials)
     return brand_socials
+
+
+def bulk_update_brand_socials(db: Session, brand_id: UUID, changes: list[dict]) -> list[BrandSocial] | None:
+    affected_ids = _bulk_update(db, BrandSocial, changes, BrandSocial.brand_id == brand_id)
+    if affected_ids is None:
+        return None
+    brand_socials = db.scalars(
+        select(BrandSocial)
+        .where(BrandSocial.id.in_(affected_ids))
+        .options(
+            selectinload(BrandSocial.brand).selectinload(Brand.category),
+            selectinload(BrandSocial.social),
+            selectinload(BrandSocial.created_by),
+            selectinload(BrandSocial.updated_by),
+            selectinload(BrandSocial.deleted_by),
+        )
+    ).all()
+    brand_socials_by_id = {brand_social.id: brand_social for brand_social in brand_socials}
+    return [brand_socials_by_id[change["id"]] for change in changes]
@@ -1,8 +1,173 @@
+import math
 import os
+import random
+import time
+from contextvars import ContextVar
+from functools import cache
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
-engine = create_engine(os.getenv("SQLALCHEMY_DATABASE_URL"))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def behind_pgbouncer() -> bool:
+    """Whether the database URLs point at PgBouncer in transaction pooling mode, DB_PGBOUNCER=true."""
+    return os.getenv("DB_PGBOUNCER") == "true"
+
+
+def reset_session(dbapi_connection, connection_record) -> None:
+    """Give connections back to the pool out of autocommit and with psycopg2's default characteristics.
+
+    Both only change how psycopg2 begins the next transaction. Characteristics left set on a connection would instead
+    be SET for the whole session by psycopg2 when it enters autocommit: a round trip, and session state that would
+    outlive the request behind PgBouncer.
+    """
+    if dbapi_connection is not None:
+        dbapi_connection.autocommit = False
+        dbapi_connection.set_session(isolation_level="DEFAULT", readonly="DEFAULT", deferrable="DEFAULT")
+
+
+class DeadlineExceeded(Exception):
+    """The request a statement runs for reached its deadline, before or while the statement ran."""
+
+
+def remaining_ms() -> int | None:
+    """Whole milliseconds left until the deadline of the current request, None without one."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    remaining = math.floor((deadline - time.monotonic()) * 1000)
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return remaining
+
+
+def execute_before_deadline(cursor, statement, parameters, context):
+    """Run every statement of a request with a deadline under a SET LOCAL statement_timeout of the time it has left.
+
+    The SET LOCAL goes in the same message as the statement, which makes the two a transaction of their own in
+    autocommit, so it costs no round trip and ends with the statement, or with the transaction it is part of.
+    psycopg2 wraps the statement of a named, server side, cursor in a DECLARE, whose rows are fetched while a
+    streamed response is sent. Its 200 is out by then, so those only need to start before the deadline and run without
+    a timeout. Returning None leaves the execution to SQLAlchemy.
+    """
+    timeout = remaining_ms()
+    if timeout is None or cursor.name is not None:
+        return None
+    cursor.execute(f"SET LOCAL statement_timeout = {timeout}; {statement}", parameters)
+    return True
+
+
+def execute_no_params_before_deadline(cursor, statement, context):
+    return execute_before_deadline(cursor, statement, None, context)
+
+
+def execute_many_before_deadline(cursor, statement, parameters, context):
+    # Only writes run many rows at once, always in a transaction
+    timeout = remaining_ms()
+    if timeout is not None:
+        with cursor.connection.cursor() as plain_cursor:
+            plain_cursor.execute(f"SET LOCAL statement_timeout = {timeout}")
+
+
+def cancelled_by_deadline(context):
+    # 57014 is query_canceled, as statement_timeout cancels
+    if request_deadline.get() is not None and getattr(context.original_exception, "pgcode", None) == "57014":
+        return DeadlineExceeded()
+    return None
+
+
+def engine_for(url: str) -> Engine:
+    """An engine keeping DB_POOL_SIZE connections (default 5) and up to DB_MAX_OVERFLOW more (default 10).
+
+    Behind PgBouncer the pool size defaults to 0, no pool at all: PgBouncer keeps the server connections and a client
+    connection to it is cheap. PgBouncer hands every transaction to whichever server connection is free, which should
+    be safe because psycopg2 never prepares statements on the server and nothing here sets session state, only
+    transaction state (see RoutingSession). test_success_pgbouncer checks it under `make citest`, where the test compose
+    file runs PgBouncer, and skips anywhere else.
+    """
+    pool_size = int(os.getenv("DB_POOL_SIZE", 0 if behind_pgbouncer() else 5))
+    if pool_size == 0:
+        engine = create_engine(url, poolclass=NullPool)
+    else:
+        engine = create_engine(url, pool_size=pool_size, max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)))
+    event.listen(engine, "checkin", reset_session)
+    event.listen(engine, "do_execute", execute_before_deadline)
+    event.listen(engine, "do_execute_no_params", execute_no_params_before_deadline)
+    event.listen(engine, "do_executemany", execute_many_before_deadline)
+    event.listen(engine, "handle_error", cancelled_by_deadline)
+    return engine
+
+
+engine = engine_for(os.getenv("SQLALCHEMY_DATABASE_URL"))
+# Streaming replicas of the primary, none unless REPLICA_DATABASE_URLS lists them, comma separated
+replica_engines = [engine_for(url.strip()) for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Streamed exports read everything from one snapshot, and deferrable they never fail or hold back writers for it
+EXPORT_EXECUTION_OPTIONS = {
+    "isolation_level": "SERIALIZABLE",
+    "postgresql_readonly": True,
+    "postgresql_deferrable": True,
+}
+
+# Set for requests that only read and whose client did not write recently, see utils/replicas.py
+read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+# The time.monotonic() by which the current request has to be answered, none unless set by utils/deadlines.py
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+def enter_autocommit(connection) -> None:
+    dbapi_connection = connection.connection.dbapi_connection
+    dbapi_connection.autocommit = True
+
+
+@cache
+def read_only(engine: Engine, export: bool = False) -> Engine:
+    """`engine` with its connections in autocommit or, for an export, in a read only deferrable transaction. Both
+    share its pool.
+
+    Autocommit is switched on psycopg2's connection itself rather than with isolation_level="AUTOCOMMIT", for which
+    psycopg2 may SET default_transaction_isolation for the whole session, see reset_session.
+    """
+    if export:
+        return engine.execution_options(**EXPORT_EXECUTION_OPTIONS)
+    autocommit = engine.execution_options()
+    event.listen(autocommit, "begin", enter_autocommit)
+    return autocommit
+
+
+class RoutingSession(Session):
+    """A session that reads from a replica while read_from_replica is set, and from the primary otherwise.
+
+    Anything it writes, flushed objects or DML statements, always goes to the primary. One session sticks to one
+    replica, so a request never sees two of them at different points of the replication.
+
+    A session made with info={"read_only": True} reads in autocommit. Every statement takes its own snapshot as it
+    would in a READ COMMITTED transaction, without the BEGIN and ROLLBACK round trips around them. Statements streamed
+    with yield_per need a transaction for their server side cursor, they get one on a connection of their own that is
+    never in autocommit: psycopg2 sets read only and deferrable for the session on an autocommit connection, and those
+    settings would outlive the request behind PgBouncer.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or getattr(clause, "is_dml", False):
+            return super().get_bind(mapper, clause=clause, **kw)
+        if replica_engines and read_from_replica.get():
+            if "replica" not in self.info:
+                self.info["replica"] = random.choice(replica_engines)
+            bind = self.info["replica"]
+        else:
+            bind = super().get_bind(mapper, clause=clause, **kw)
+        if not self.info.get("read_only"):
+            return bind
+        return read_only(bind, export="yield_per" in getattr(clause, "get_execution_options", dict)())
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+
+def session_for(method: str) -> Session:
+    """The session for a request with HTTP `method`, read only for the safe ones."""
+    return SessionLocal(info={"read_only": method in SAFE_METHODS})
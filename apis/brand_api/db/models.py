@@ -1,12 +1,41 @@
+import secrets
+import threading
+import time
 from datetime import datetime
 from enum import Enum as pyEnum
 from typing import Optional
-from uuid import UUID, uuid4
+from uuid import UUID
 
 from sqlalchemy import Enum, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
+# The millisecond and counter of the last UUID made by this process
+last_uuid7 = (0, 0)
+uuid7_lock = threading.Lock()
+
+
+def uuid7() -> UUID:
+    """A version 7 UUID: the Unix time in milliseconds followed by random bits, so primary keys made later sort after
+    the earlier ones and new rows go to the right edge of the index rather than anywhere in it.
+
+    The 12 bits after the time count up from a random start within a millisecond, and carry over into the next one
+    (RFC 9562, method 1), so the keys of one process never go backwards, not even when the clock does.
+    """
+    global last_uuid7
+    with uuid7_lock:
+        milliseconds, counter = last_uuid7
+        now = time.time_ns() // 1_000_000
+        if now > milliseconds:
+            # Starting in the lower half leaves room to count up
+            milliseconds, counter = now, secrets.randbits(11)
+        elif counter < 0xFFF:
+            counter += 1
+        else:
+            milliseconds, counter = milliseconds + 1, secrets.randbits(11)
+        last_uuid7 = milliseconds, counter
+    return UUID(int=milliseconds << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | secrets.randbits(62))
+
 
 class Base(DeclarativeBase):
     pass
@@ -15,21 +44,21 @@ class Base(DeclarativeBase):
 class Role(Base):
     __tablename__ = "roles"
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
     name: Mapped[str] = mapped_column(unique=True)
 
 
 class Social(Base):
     __tablename__ = "socials"
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
     name: Mapped[str] = mapped_column(unique=True)
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
     username: Mapped[str] = mapped_column(unique=True)
     email: Mapped[Optional[str]] = mapped_column(unique=True)
     password: Mapped[str]
@@ -52,7 +81,7 @@ class User(Base):
 class Category(Base):
     __tablename__ = "categories"
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
     name: Mapped[str] = mapped_column(unique=True)
 
     created_by_id: Mapped[UUID] = mapped_column(ForeignKey("users.id", name="users_id_created_by"))
@@ -81,7 +110,7 @@ class AveragePrice(int, pyEnum):
 class Brand(Base):
     __tablename__ = "brands"
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
     name: Mapped[str] = mapped_column(unique=True)
     category_id: Mapped[UUID] = mapped_column(ForeignKey("categories.id"))
     description: Mapped[Optional[str]]
@@ -113,7 +142,7 @@ class Brand(Base):
 class BrandSocial(Base):
     __tablename__ = "brands_socials"
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
     brand_id: Mapped[UUID] = mapped_column(ForeignKey("brands.id"))
     brand: Mapped["Brand"] = relationship("Brand", backref="brands_socials_brand", foreign_keys=[brand_id])
     social_id: Mapped[UUID] = mapped_column(ForeignKey("socials.id"))
@@ -1,21 +1,21 @@
 import os
 from datetime import datetime
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from . import schemas
-from .db.database import SessionLocal
+from .crud import read_role_name
+from .db.database import SessionLocal, session_for
 from .db.models import User
 
 reuseable_oauth = OAuth2PasswordBearer(tokenUrl="/login", scheme_name="JWT")
 
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(request.method)
     try:
         yield db
     finally:
@@ -25,6 +25,9 @@ def get_db():
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(reuseable_oauth)
 ) -> schemas.UserResponsePassword:
+    # jose is slow to import, so it waits until the first token is checked
+    from jose import jwt
+
     try:
         payload = jwt.decode(token, os.getenv("JWT_SECRET_KEY"), algorithms=os.getenv("ALGORITHM"))
         token_data = schemas.TokenPayload(**payload)
@@ -51,3 +54,34 @@ def get_current_user(
         )
 
     return schemas.UserResponsePassword(**user.__dict__)
+
+
+def get_admin_user(
+    db: Session = Depends(get_db), current_user: schemas.UserResponsePassword = Depends(get_current_user)
+) -> schemas.UserResponsePassword:
+    if read_role_name(db, current_user.id) != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can do this")
+    return current_user
+
+
+def page_limit(limit: int = Query(default=100, ge=0), stream: bool = False) -> int:
+    """The `limit` of a list route, capped at MAX_PAGE_SIZE unless the page is streamed."""
+    max_page_size = int(os.getenv("MAX_PAGE_SIZE", 1000))
+    if limit > max_page_size and not stream:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"limit can not be higher than {max_page_size}, use stream=true for bigger pages",
+        )
+    return limit
+
+
+def is_admin_token(token: str) -> bool:
+    """Whether `token` belongs to an admin, for checks made outside of a route."""
+    db = SessionLocal()
+    try:
+        current_user = get_current_user(db, token)
+        return read_role_name(db, current_user.id) == "admin"
+    except HTTPException:
+        return False
+    finally:
+        db.close()
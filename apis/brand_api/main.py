@@ -1,36 +1,51 @@
 import json
 import os
 import tomllib
+from contextlib import asynccontextmanager
 from datetime import datetime
+from pathlib import Path
 
 from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.exceptions import HTTPException, RequestValidationError, ValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from . import schemas
 from .crud import create_user, read_user
-from .db.database import SessionLocal, engine
+from .db.database import DeadlineExceeded, engine, replica_engines
 from .db.models import Base, User
-from .routers import brands, categories, socials, users
+from .dependencies import get_db, is_admin_token
+from .routers import admin, brands, categories, health, socials, users
+from .utils.compression import CompressionMiddleware
+from .utils.deadlines import DeadlineMiddleware, route_timeouts
 from .utils.logging import logger
+from .utils.memory import track_sessions
+from .utils.metrics import MetricsMiddleware, instrument_engine, metrics
 from .utils.password_hash import get_hashed_password, verify_password
+from .utils.profiling import ProfilingMiddleware
+from .utils.rate_limits import (
+    DEFAULT_RATE_LIMITS,
+    RATE_LIMIT_HEADERS,
+    LocalBuckets,
+    RateLimitMiddleware,
+    SharedBuckets,
+    rate_limits,
+)
+from .utils.replicas import PRIMARY_UNTIL_HEADER, ReplicaRoutingMiddleware
+from .utils.saturation import AdmissionMiddleware, monitor
+from .utils.slow_queries import log_slow_queries
 from .utils.tokens import create_access_token, create_refresh_token
+from .utils.warmup import warm_up
 
-logger.info("---Start of the API.---")
-
-Base.metadata.create_all(engine)
-db = SessionLocal()
-
-with open("pyproject.toml", "rb") as f:
-    data = tomllib.load(f)
-
+PYPROJECT = Path(__file__).parents[2] / "pyproject.toml"
+# Any number, as long as nothing else takes a Postgres advisory lock with it
+STARTUP_LOCK = 4_201_337
 
 app = FastAPI(
     title="Brands API",
-    version=data["tool"]["poetry"]["version"],
     description="<h3>An API to manage a data set related to brands that are Made in Portugal.\
         </h3><br /><h2>CAUTION: The data on this API is still in alpha and subject to being \
         deleted without prior notice. Use at your own risk.</h2><br /><h3>Current username and \
@@ -55,45 +70,134 @@ def validation_exception_handler(request, exc):
 
     return JSONResponse(response, status_code=422)
 
+
+@app.exception_handler(DeadlineExceeded)
+def deadline_exceeded_handler(request, exc):
+    return JSONResponse(
+        {"detail": "The request did not finish before its deadline"}, status_code=status.HTTP_504_GATEWAY_TIMEOUT
+    )
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PRIMARY_UNTIL_HEADER, *RATE_LIMIT_HEADERS],
+)
+if replica_engines:
+    app.add_middleware(ReplicaRoutingMiddleware, pin_seconds=float(os.getenv("REPLICA_PIN_SECONDS", 5)))
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1000)),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", 6)),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4)),
+    cache_size=int(os.getenv("COMPRESSION_CACHE_SIZE", 128)),
 )
+app.add_middleware(ProfilingMiddleware, is_admin=is_admin_token)
+app.add_middleware(
+    AdmissionMiddleware,
+    max_queue_wait_ms=float(os.getenv("ADMISSION_MAX_QUEUE_WAIT_MS", 1000)),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", 1)),
+    exempt=("/metrics", "/healthz"),
+)
+# Outside admission, so the time a request waits for a thread counts against its deadline
+app.add_middleware(
+    DeadlineMiddleware,
+    timeout_ms=float(os.getenv("REQUEST_TIMEOUT_MS", 30000)),
+    route_timeouts_ms=route_timeouts(os.getenv("ROUTE_TIMEOUTS_MS", "")),
+)
+# Outermost but for the metrics, a limited client costs as little as possible and its 429s are still counted
+limits = rate_limits(os.getenv("RATE_LIMITS", "" if os.getenv("ENVIRONMENT") == "test" else DEFAULT_RATE_LIMITS))
+if limits:
+    # Made here, when the app is imported, so workers forked from a preloading server share them
+    buckets = SharedBuckets() if os.getenv("RATE_LIMIT_SHARED") == "true" else LocalBuckets()
+    app.add_middleware(RateLimitMiddleware, limits=limits, buckets=buckets)
+# Added last so it is the outermost, timing everything the other middlewares do too
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+log_slow_queries(engine)
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine, pool_metrics=False)
+    log_slow_queries(replica_engine)
+track_sessions()
+app.add_route("/metrics", metrics, include_in_schema=False)
+
+
+def create_trial_user(connection):
+    with Session(bind=connection) as db:
+        user_query = db.query(User).first()
+        if user_query == None:
+            db_user = User(
+                username="trialUser", password=get_hashed_password("TrialPassword1"), created_at=datetime.now()
+            )
+            db.add(db_user)
+            db.commit()
+
+
+def prepare_database():
+    """Create the tables, and the trial user outside of tests.
+
+    Every worker runs this when it starts, an advisory lock makes them take turns instead of racing to create the
+    same tables.
+    """
+    with engine.begin() as connection:
+        connection.execute(select(func.pg_advisory_xact_lock(STARTUP_LOCK)))
+        Base.metadata.create_all(connection)
+        if os.getenv("ENVIRONMENT") != "test":
+            create_trial_user(connection)
+
+
+def read_version() -> str:
+    try:
+        with open(PYPROJECT, "rb") as f:
+            return tomllib.load(f)["tool"]["poetry"]["version"]
+    except FileNotFoundError:
+        logger.warning(f"Could not find {PYPROJECT} to read the version from")
+        return app.version
 
 
-@app.on_event("startup")
-def get_db():
-    try:
-        yield db
-    finally:
-        db.close()
+def openapi_body() -> bytes:
+    """The OpenAPI schema, rendered the first time it is asked for and kept."""
+    if not hasattr(app.state, "openapi_body"):
+        app.version = read_version()
+        app.state.openapi_body = JSONResponse(app.openapi()).body
+    return app.state.openapi_body
+
+
+async def openapi(request: Request) -> Response:
+    return Response(openapi_body(), media_type="application/json")
 
 
-def create_trial_user(db: Session = Depends(get_db)):
-    user_query = db.query(User).first()
-    if user_query == None:
-        db_user = User(username="trialUser", password=get_hashed_password("TrialPassword1"), created_at=datetime.now())
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+# Swap the route FastAPI renders the schema on every request for one serving it already rendered
+app.router.routes = [route for route in app.router.routes if getattr(route, "path", None) != app.openapi_url]
+app.add_route(app.openapi_url, openapi, include_in_schema=False)
 
 
-if os.getenv("ENVIRONMENT") != "test":
-    create_trial_user(db)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Everything that needs the database or the disk happens here, so importing the app stays cheap."""
+    logger.info("---Start of the API.---")
+    prepare_database()
+    openapi_body()
+    # Before the server accepts any connection, so no request ever lands on a cold worker
+    await warm_up(app, engine)
+    monitor.start()
+    yield
+    await monitor.stop()
 
 
-@app.on_event("shutdown")
-def close_db():
-    db.close()
+# FastAPI 0.92 has no lifespan argument yet, this is what it would set
+app.router.lifespan_context = lifespan
 
 
 app.include_router(users.router)
 app.include_router(categories.router)
 app.include_router(socials.router)
 app.include_router(brands.router)
+app.include_router(admin.router)
+app.include_router(health.router)
 
 
 @app.get("/", status_code=405, include_in_schema=False)
@@ -0,0 +1,93 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+
+from ..dependencies import get_admin_user
+from ..utils.memory import (
+    diff_allocations,
+    session_instances,
+    start_tracing,
+    stop_tracing,
+    take_snapshot,
+    top_allocations,
+    tracing_status,
+)
+from ..utils.profiling import list_profiles, profile_path
+from ..utils.slow_queries import slow_queries
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(get_admin_user)], tags=["Admin"], include_in_schema=False)
+
+
+@router.get("/slow-queries", summary="The most recent slow SQL statements with their plans, newest first")
+def get_slow_queries():
+    return {"slow_queries": list(reversed(slow_queries))}
+
+
+@router.get("/profiles", summary="The stored request profiles, newest first")
+def get_profiles():
+    return {"profiles": list_profiles()}
+
+
+@router.get("/profiles/{profile_id}", summary="Download a request profile, to open in speedscope")
+def get_profile(profile_id: str):
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=path.name)
+
+
+@router.get("/memory", summary="Whether allocations are traced, how much memory they hold and the snapshots taken")
+def get_memory():
+    return tracing_status()
+
+
+@router.post("/memory/start", summary="Start tracing allocations, with `frames` frames of traceback for each")
+def post_memory_start(frames: int = Query(default=1, ge=1, le=100)):
+    return start_tracing(frames)
+
+
+@router.post("/memory/stop", summary="Stop tracing allocations, keeping the snapshots already taken")
+def post_memory_stop():
+    return stop_tracing()
+
+
+@router.post("/memory/snapshots", summary="Snapshot the traced allocations", status_code=201)
+def post_memory_snapshot():
+    snapshot = take_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Allocations are not traced, start first")
+    return snapshot
+
+
+@router.get("/memory/snapshots/{snapshot_id}", summary="The allocation sites holding the most memory in a snapshot")
+def get_memory_snapshot(
+    snapshot_id: int,
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(default=25, ge=1),
+):
+    allocations = top_allocations(snapshot_id, key_type, limit)
+    if allocations is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    return {"allocations": allocations}
+
+
+@router.get(
+    "/memory/snapshots/{snapshot_id}/diff/{base_id}",
+    summary="The allocation sites that grew or shrank the most since an older snapshot",
+)
+def get_memory_snapshot_diff(
+    snapshot_id: int,
+    base_id: int,
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(default=25, ge=1),
+):
+    allocations = diff_allocations(snapshot_id, base_id, key_type, limit)
+    if allocations is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    return {"allocations": allocations}
+
+
+@router.get("/memory/sessions", summary="The ORM instances held by every live session, counted by class")
+def get_memory_sessions():
+    return {"sessions": [dict(instances) for instances in session_instances()]}
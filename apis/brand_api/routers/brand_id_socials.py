@@ -1,27 +1,32 @@
 from datetime import datetime
+from typing import Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
 from sqlalchemy.orm import Session
 
 from .. import schemas
 from ..crud import (
+    bulk_update_brand_socials,
     create_brand_social,
-    read_all_brand_socials,
+    read_all_brand_socials_rows,
     read_brand,
     read_brand_socials,
+    read_included_users,
     read_social,
+    read_social_ids,
     update_brand_socials,
 )
-from ..db.database import SessionLocal
-from ..dependencies import get_current_user
+from ..db.database import session_for
+from ..dependencies import get_current_user, page_limit
+from ..utils.rendering import LIST_RESPONSES, STREAM_YIELD_PER, render, stream
 
 router = APIRouter(prefix="/{brand_id}/socials", tags=["Brands"])
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(request.method)
     try:
         yield db
     finally:
@@ -51,15 +56,92 @@ def post_brand_social(
     return {"socials": [create_brand_social(db, data, brand_id, current_user.id)]}
 
 
-@router.get("/", response_model=schemas.ListOfBrandSocials, summary="List all socials pertaining to a brand")
+@router.get(
+    "/",
+    response_model=Union[schemas.ListOfBrandSocials, schemas.ListOfSideloadedBrandSocials],
+    summary="List all socials pertaining to a brand",
+    responses=LIST_RESPONSES,
+)
 def get_all_brand_socials(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Depends(page_limit),
+    stream_rows: bool = Query(default=False, alias="stream"),
     show_deleted: bool = False,
+    sideload_users: bool = False,
     brand_id: UUID = Path(title="The UUID of the brand add socials to"),
     db: Session = Depends(get_db),
 ):
-    return {"socials": read_all_brand_socials(db, brand_id, skip=skip, limit=limit, show_deleted=show_deleted)}
+    if stream_rows:
+        if sideload_users:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="sideload_users is not available with stream=true",
+            )
+        socials = read_all_brand_socials_rows(
+            db, brand_id, skip=skip, limit=limit, show_deleted=show_deleted, yield_per=STREAM_YIELD_PER
+        )
+        return stream(request, schemas.ListOfBrandSocials, socials)
+    socials = read_all_brand_socials_rows(
+        db, brand_id, skip=skip, limit=limit, show_deleted=show_deleted, sideload_users=sideload_users
+    )
+    if sideload_users:
+        included = {"users": read_included_users(db, socials)}
+        return render(request, schemas.ListOfSideloadedBrandSocials, {"socials": socials, "included": included})
+    return render(request, schemas.ListOfBrandSocials, {"socials": socials})
+
+
+@router.patch("/bulk", response_model=schemas.ListOfBrandSocials, summary="Update several socials of a brand at once")
+def patch_brand_socials_bulk(
+    data: schemas.BrandSocialsBulkPatchBody,
+    brand_id: UUID = Path(title="The id of the brand to update it's socials"),
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponsePassword = Depends(get_current_user),
+):
+    # Path
+    brand = read_brand(db, param={"id": brand_id})
+    if brand is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brand not found")
+    # Body, once per distinct social
+    changes = [item.dict(exclude_unset=True) for item in data.socials]
+    social_ids = {change["social_id"] for change in changes if "social_id" in change}
+    if social_ids and read_social_ids(db, social_ids) != social_ids:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Social must exist.")
+    updated_at = datetime.now()
+    for change in changes:
+        change["updated_at"] = updated_at
+        change["updated_by_id"] = current_user.id
+    brand_socials = bulk_update_brand_socials(db, brand_id, changes)
+    if brand_socials is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="This social was not found associated with this brand"
+        )
+    return {"socials": brand_socials}
+
+
+@router.delete(
+    "/bulk", response_model=schemas.ListOfBrandSocials, summary="Delete several socials from a brand at once"
+)
+def delete_brand_socials_bulk(
+    data: schemas.BulkDeleteBody,
+    brand_id: UUID = Path(title="The id of the brand to delete socials from"),
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponsePassword = Depends(get_current_user),
+):
+    brand = read_brand(db, param={"id": brand_id})
+    if brand is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brand not found")
+    deleted_at = datetime.now()
+    changes = [
+        {"id": brand_social_id, "deleted_at": deleted_at, "deleted_by_id": current_user.id}
+        for brand_social_id in data.ids
+    ]
+    brand_socials = bulk_update_brand_socials(db, brand_id, changes)
+    if brand_socials is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="This social was not found associated with this brand"
+        )
+    return {"socials": brand_socials}
 
 
 @router.patch("/{brand_social_id}", response_model=schemas.ListOfBrandSocials, summary="Update the social of a brand")
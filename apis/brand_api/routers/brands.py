@@ -1,14 +1,29 @@
 from datetime import datetime
 from enum import Enum
+from os import getenv
+from typing import Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..crud import create_brand, read_all_brands, read_brand, read_category, update_brand
-from ..db.database import SessionLocal
-from ..dependencies import get_current_user
+from ..crud import (
+    bulk_update_brands,
+    create_brand,
+    read_all_brands_document,
+    read_all_brands_rows,
+    read_brand,
+    read_category,
+    read_category_ids,
+    read_included_users,
+    update_brand,
+    upsert_brands,
+)
+from ..db.database import session_for
+from ..dependencies import get_current_user, page_limit
+from ..utils.rendering import JSON, LIST_RESPONSES, STREAM_YIELD_PER, negotiate, render, stream
 from . import brand_id_socials
 
 router = APIRouter(prefix="/brands", tags=["Brands"])
@@ -27,8 +42,8 @@ class OrderDirection(str, Enum):
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(request.method)
     try:
         yield db
     finally:
@@ -56,18 +71,43 @@ def post_brand(
     return {"brands": [create_brand(db, data, current_user.id)]}
 
 
-@router.get("/", response_model=schemas.ListOfBrands, summary="List all brands")
+@router.get(
+    "/",
+    response_model=Union[schemas.ListOfBrands, schemas.ListOfSideloadedBrands],
+    summary="List all brands",
+    responses=LIST_RESPONSES,
+)
 def get_all_brands(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Depends(page_limit),
+    stream_rows: bool = Query(default=False, alias="stream"),
     show_deleted: bool = False,
     order_by: OrderBy = OrderBy.created_at,
     direction: OrderDirection = OrderDirection.asc,
     category_id: UUID = None,
+    sideload_users: bool = False,
     db: Session = Depends(get_db),
 ):
-    return {
-        "brands": read_all_brands(
+    if stream_rows:
+        if sideload_users:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="sideload_users is not available with stream=true",
+            )
+        brands = read_all_brands_rows(
+            db,
+            skip=skip,
+            limit=limit,
+            show_deleted=show_deleted,
+            order_by=order_by,
+            direction=direction,
+            category_id=category_id,
+            yield_per=STREAM_YIELD_PER,
+        )
+        return stream(request, schemas.ListOfBrands, brands)
+    if getenv("LIST_RENDERER") == "database" and negotiate(request) == JSON and not sideload_users:
+        document = read_all_brands_document(
             db,
             skip=skip,
             limit=limit,
@@ -76,9 +116,97 @@ def get_all_brands(
             direction=direction,
             category_id=category_id,
         )
+        return Response(document, media_type=JSON, headers={"Vary": "Accept"})
+    # Rows are already shaped like the response model, so they skip the ORM and Pydantic round trip
+    brands = read_all_brands_rows(
+        db,
+        skip=skip,
+        limit=limit,
+        show_deleted=show_deleted,
+        order_by=order_by,
+        direction=direction,
+        category_id=category_id,
+        sideload_users=sideload_users,
+    )
+    if sideload_users:
+        included = {"users": read_included_users(db, brands)}
+        return render(request, schemas.ListOfSideloadedBrands, {"brands": brands, "included": included})
+    return render(request, schemas.ListOfBrands, {"brands": brands})
+
+
+@router.patch("/bulk", response_model=schemas.ListOfBrands, summary="Update several brands at once")
+def patch_brands_bulk(
+    data: schemas.BrandsBulkPatchBody,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponsePassword = Depends(get_current_user),
+):
+    changes = [item.dict(exclude_unset=True) for item in data.brands]
+    # Body check, once per distinct category
+    category_ids = {change["category_id"] for change in changes if "category_id" in change}
+    if category_ids and read_category_ids(db, category_ids) != category_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category must exist")
+    updated_at = datetime.now()
+    for change in changes:
+        change["updated_at"] = updated_at
+        change["updated_by_id"] = current_user.id
+    brands = bulk_update_brands(db, changes)
+    if brands is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brand not found")
+    return {"brands": brands}
+
+
+@router.delete("/bulk", response_model=schemas.ListOfBrands, summary="Delete several brands at once")
+def delete_brands_bulk(
+    data: schemas.BulkDeleteBody,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponsePassword = Depends(get_current_user),
+):
+    deleted_at = datetime.now()
+    changes = [{"id": brand_id, "deleted_at": deleted_at, "deleted_by_id": current_user.id} for brand_id in data.ids]
+    brands = bulk_update_brands(db, changes)
+    if brands is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brand not found")
+    return {"brands": brands}
+
+
+def upsert_response(upserted: list[tuple]) -> dict[str, list[schemas.BrandsUpsertResponse]]:
+    return {
+        "brands": [
+            schemas.BrandsUpsertResponse(**schemas.BrandsResponse.from_orm(brand).dict(), status=upsert_status)
+            for brand, upsert_status in upserted
+        ]
     }
 
 
+@router.put(
+    "/by-name/{name}", response_model=schemas.ListOfUpsertedBrands, summary="Create or replace a brand by it's name"
+)
+def put_brand_by_name(
+    data: schemas.BrandsUpsertBody,
+    name: str = Path(title="The name of the brand to create or replace"),
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponsePassword = Depends(get_current_user),
+):
+    category = read_category(db, param={"id": data.category_id})
+    if category is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category must exist")
+    return upsert_response(upsert_brands(db, [{"name": name, **data.dict()}], current_user.id))
+
+
+@router.put("/by-name", response_model=schemas.ListOfUpsertedBrands, summary="Create or replace several brands by name")
+def put_brands_by_name(
+    data: schemas.BrandsBulkUpsertBody,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponsePassword = Depends(get_current_user),
+):
+    brands = [item.dict() for item in data.brands]
+    # Body check, once per distinct category
+    category_ids = {brand["category_id"] for brand in brands}
+    if read_category_ids(db, category_ids) != category_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category must exist")
+    return upsert_response(upsert_brands(db, brands, current_user.id))
+
+
 @router.get(
     "/{brand_id}",
     response_model=schemas.ListOfBrands,
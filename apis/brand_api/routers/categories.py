@@ -1,14 +1,25 @@
 from datetime import datetime
 from enum import Enum
+from os import getenv
+from typing import Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..crud import create_category, read_all_categories, read_category, update_category
-from ..db.database import SessionLocal
-from ..dependencies import get_current_user
+from ..crud import (
+    create_category,
+    read_all_categories_document,
+    read_all_categories_rows,
+    read_category,
+    read_included_users,
+    update_category,
+)
+from ..db.database import session_for
+from ..dependencies import get_current_user, page_limit
+from ..utils.rendering import JSON, LIST_RESPONSES, STREAM_YIELD_PER, negotiate, render, stream
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
@@ -24,8 +35,8 @@ class OrderDirection(str, Enum):
     desc = "desc"
 
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(request.method)
     try:
         yield db
     finally:
@@ -65,22 +76,55 @@ def post_category(
 
 @router.get(
     "/",
-    response_model=schemas.ListOfCategories,
+    response_model=Union[schemas.ListOfCategories, schemas.ListOfSideloadedCategories],
     tags=["Categories"],
+    responses=LIST_RESPONSES,
 )
 def get_all_categories(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Depends(page_limit),
+    stream_rows: bool = Query(default=False, alias="stream"),
     show_deleted: bool = False,
     order_by: OrderBy = OrderBy.created_at,
     direction: OrderDirection = OrderDirection.asc,
+    sideload_users: bool = False,
     db: Session = Depends(get_db),
 ):
-    return {
-        "categories": read_all_categories(
+    if stream_rows:
+        if sideload_users:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="sideload_users is not available with stream=true",
+            )
+        categories = read_all_categories_rows(
+            db,
+            skip=skip,
+            limit=limit,
+            show_deleted=show_deleted,
+            order_by=order_by,
+            direction=direction,
+            yield_per=STREAM_YIELD_PER,
+        )
+        return stream(request, schemas.ListOfCategories, categories)
+    if getenv("LIST_RENDERER") == "database" and negotiate(request) == JSON and not sideload_users:
+        document = read_all_categories_document(
             db, skip=skip, limit=limit, show_deleted=show_deleted, order_by=order_by, direction=direction
         )
-    }
+        return Response(document, media_type=JSON, headers={"Vary": "Accept"})
+    categories = read_all_categories_rows(
+        db,
+        skip=skip,
+        limit=limit,
+        show_deleted=show_deleted,
+        order_by=order_by,
+        direction=direction,
+        sideload_users=sideload_users,
+    )
+    if sideload_users:
+        included = {"users": read_included_users(db, categories)}
+        return render(request, schemas.ListOfSideloadedCategories, {"categories": categories, "included": included})
+    return render(request, schemas.ListOfCategories, {"categories": categories})
 
 
 @router.get(
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ..db.database import engine
+from ..utils.health import cached_readiness
+
+router = APIRouter(tags=["Health"], include_in_schema=False)
+
+
+# Async so it is answered on the event loop, even when every thread is busy
+@router.get("/healthz", summary="Whether the process is alive, without any I/O")
+async def get_healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz", summary="Whether the database, its migrations and the caches are ready to serve traffic")
+def get_readyz(request: Request):
+    readiness = cached_readiness(request.app, engine)
+    status_code = status.HTTP_200_OK if readiness["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(jsonable_encoder(readiness), status_code=status_code)
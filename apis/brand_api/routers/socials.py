@@ -1,17 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..crud import create_social, read_all_socials, read_social
-from ..db.database import SessionLocal
-from ..dependencies import get_current_user
+from ..crud import create_social, read_all_socials_rows, read_social
+from ..db.database import session_for
+from ..dependencies import get_current_user, page_limit
+from ..utils.rendering import LIST_RESPONSES, STREAM_YIELD_PER, render, stream
 
 router = APIRouter(prefix="/socials", dependencies=[Depends(get_current_user)], tags=["Socials"])
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(request.method)
     try:
         yield db
     finally:
@@ -39,6 +40,19 @@ def post_social(
     "/",
     response_model=schemas.ListOfSocials,
     summary="Get all available social networks",
+    responses=LIST_RESPONSES,
 )
-def get_all_socials(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return {"socials": read_all_socials(db, skip=skip, limit=limit)}
+def get_all_socials(
+    request: Request,
+    skip: int = 0,
+    limit: int = Depends(page_limit),
+    stream_rows: bool = Query(default=False, alias="stream"),
+    db: Session = Depends(get_db),
+):
+    if stream_rows:
+        return stream(
+            request,
+            schemas.ListOfSocials,
+            read_all_socials_rows(db, skip=skip, limit=limit, yield_per=STREAM_YIELD_PER),
+        )
+    return render(request, schemas.ListOfSocials, {"socials": read_all_socials_rows(db, skip=skip, limit=limit)})
@@ -3,14 +3,15 @@ from enum import Enum
 from os import getenv
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, status
 from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..crud import read_all_users, read_user, update_user
-from ..db.database import SessionLocal
-from ..dependencies import get_current_user
+from ..crud import read_all_users_rows, read_user, update_user
+from ..db.database import session_for
+from ..dependencies import get_current_user, page_limit
 from ..utils.password_hash import get_hashed_password
+from ..utils.rendering import LIST_RESPONSES, STREAM_YIELD_PER, render, stream
 
 router = APIRouter(prefix="/users", dependencies=[Depends(get_current_user)], tags=["Users"])
 
@@ -29,8 +30,8 @@ class OrderDirection(str, Enum):
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(request.method)
     try:
         yield db
     finally:
@@ -41,19 +42,33 @@ def get_db():
     "/",
     response_model=schemas.ListOfUsers,
     summary="Get details of all users",
+    responses=LIST_RESPONSES,
 )
 def get_all_users(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Depends(page_limit),
+    stream_rows: bool = Query(default=False, alias="stream"),
     show_deleted: bool = False,
     order_by: OrderBy = OrderBy.created_at,
     direction: OrderDirection = OrderDirection.asc,
     db: Session = Depends(get_db),
 ):
-    response = read_all_users(
+    if stream_rows:
+        users = read_all_users_rows(
+            db,
+            skip=skip,
+            limit=limit,
+            show_deleted=show_deleted,
+            order_by=order_by.value,
+            direction=direction,
+            yield_per=STREAM_YIELD_PER,
+        )
+        return stream(request, schemas.ListOfUsers, users)
+    response = read_all_users_rows(
         db, skip=skip, limit=limit, show_deleted=show_deleted, order_by=order_by.value, direction=direction
     )
-    return {"users": response}
+    return render(request, schemas.ListOfUsers, {"users": response})
 
 
 @router.get(
@@ -1,6 +1,7 @@
 from datetime import datetime
+from enum import Enum
 from re import search
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Extra, Field, StrictStr, root_validator, validator
@@ -92,6 +93,24 @@ class ListOfBrandSocials(BaseModel):
     socials: List[BrandSocialsResponse]
 
 
+class IncludedUsers(BaseModel):
+    users: Dict[UUID, UserBase]
+
+
+class BrandSocialsSideloadedResponse(BrandSocialsBase):
+    created_at: datetime
+    created_by_id: UUID
+    updated_at: datetime | None
+    updated_by_id: UUID | None
+    deleted_at: datetime | None
+    deleted_by_id: UUID | None
+
+
+class ListOfSideloadedBrandSocials(BaseModel):
+    socials: List[BrandSocialsSideloadedResponse]
+    included: IncludedUsers
+
+
 class BrandSocialsPostBody(BaseModel):
     social_id: UUID = Field(...)
     address: StrictStr = Field(...)
@@ -127,6 +146,39 @@ class BrandSocialsPatchBody(BaseModel):
         return values
 
 
+class BrandSocialsBulkPatchItem(BrandSocialsPatchBody):
+    id: UUID = Field(...)
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "id": "4b3c1d8e-5a2f-4c1b-9d7e-0f6a8b2c4d1e",
+                "social_id": "2162262c-2a94-4872-b862-0b42e03146c0",
+                "address": "www.otherwebsite.com",
+            }
+        }
+
+    @root_validator(pre=True)
+    def validate_xor(cls, values):
+        if sum([bool(v) for k, v in values.items() if k != "id"]) < 1:
+            raise ValueError("At least one of the keys social_id or address must exist.")
+        return values
+
+
+class BrandSocialsBulkPatchBody(BaseModel):
+    socials: List[BrandSocialsBulkPatchItem] = Field(..., min_items=1)
+
+    class Config:
+        extra = Extra.forbid
+
+    @validator("socials")
+    def validate_unique_ids(cls, value):
+        ids = [item.id for item in value]
+        if len(set(ids)) != len(ids):
+            raise ValueError("each id can only be present once")
+        return value
+
+
 class CategoriesResponse(CategoriesBase):
     created_at: datetime
     created_by: UserBase
@@ -143,6 +195,20 @@ class ListOfCategories(BaseModel):
     categories: List[CategoriesResponse]
 
 
+class CategoriesSideloadedResponse(CategoriesBase):
+    created_at: datetime
+    created_by_id: UUID
+    updated_at: datetime | None
+    updated_by_id: UUID | None
+    deleted_at: datetime | None
+    deleted_by_id: UUID | None
+
+
+class ListOfSideloadedCategories(BaseModel):
+    categories: List[CategoriesSideloadedResponse]
+    included: IncludedUsers
+
+
 class CategoriesPostBody(BaseModel):
     name: StrictStr = Field(...)
 
@@ -185,8 +251,21 @@ class ListOfBrands(BaseModel):
     brands: List[BrandsResponse]
 
 
-class BrandsPostBody(BaseModel):
-    name: StrictStr = Field(...)
+class BrandsSideloadedResponse(BrandsBase):
+    created_at: datetime
+    created_by_id: UUID
+    updated_at: datetime | None
+    updated_by_id: UUID | None
+    deleted_at: datetime | None
+    deleted_by_id: UUID | None
+
+
+class ListOfSideloadedBrands(BaseModel):
+    brands: List[BrandsSideloadedResponse]
+    included: IncludedUsers
+
+
+class BrandsUpsertBody(BaseModel):
     category_id: UUID = Field(...)
     description: Optional[StrictStr] = Field(default=None)
     average_price: Optional[StrictStr] = Field(default=None)
@@ -202,22 +281,70 @@ class BrandsPostBody(BaseModel):
             raise ValueError("must correspond to the following format '0000-000'")
         return value
 
+    class Config:
+        schema_extra = {
+            "example": {
+                "category_id": "95ae9f54-7d51-4ab5-a636-87b2d12921ef",
+                "description": "This is an example of a synced brand",
+                "average_price": "medium",
+                "line_address_1": "22 Street",
+                "line_address_2": "More street info",
+                "city": "Porto",
+                "postal_code": "4400-300",
+            }
+        }
+        orm_mode = True
+        extra = Extra.forbid
+
+
+class BrandName(BaseModel):
+    name: StrictStr = Field(...)
+
+
+# BrandName second, pydantic collects the fields of the last base first and the name stays the first one checked
+class BrandsPostBody(BrandsUpsertBody, BrandName):
     class Config:
         schema_extra = {
             "example": {
                 "name": "New Brand",
                 "category_id": "95ae9f54-7d51-4ab5-a636-87b2d12921ef",
                 "description": "This is an example of a new brand",
-                "average_price": 2,
+                "average_price": "medium",
                 "line_address_1": "22 Street",
                 "line_address_2": "More street info",
                 "city": "Porto",
                 "postal_code": "4400-300",
             }
         }
-        orm_mode = True
+
+
+class UpsertStatus(str, Enum):
+    inserted = "inserted"
+    updated = "updated"
+    unchanged = "unchanged"
+
+
+class BrandsUpsertResponse(BrandsResponse):
+    status: UpsertStatus
+
+
+class ListOfUpsertedBrands(BaseModel):
+    brands: List[BrandsUpsertResponse]
+
+
+class BrandsBulkUpsertBody(BaseModel):
+    brands: List[BrandsPostBody] = Field(..., min_items=1)
+
+    class Config:
         extra = Extra.forbid
 
+    @validator("brands")
+    def validate_unique_names(cls, value):
+        names = [item.name for item in value]
+        if len(set(names)) != len(names):
+            raise ValueError("each name can only be present once")
+        return value
+
 
 class BrandsPatchBody(BaseModel):
     name: Optional[StrictStr]
@@ -242,7 +369,7 @@ class BrandsPatchBody(BaseModel):
                 "name": "New Brand",
                 "category_id": "95ae9f54-7d51-4ab5-a636-87b2d12921ef",
                 "description": "This is an example of a new brand",
-                "average_price": 3,
+                "average_price": "high",
                 "line_address_1": "22 Street",
                 "line_address_2": "More street info",
                 "city": "Porto",
@@ -260,6 +387,53 @@ class BrandsPatchBody(BaseModel):
         return values
 
 
+class BrandsBulkPatchItem(BrandsPatchBody):
+    id: UUID = Field(...)
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "id": "c8d1f0a2-6b3e-4f5a-8c7d-9e0f1a2b3c4d",
+                "category_id": "95ae9f54-7d51-4ab5-a636-87b2d12921ef",
+                "average_price": "high",
+            }
+        }
+
+    @root_validator(pre=True)
+    def validate_xor(cls, values):
+        if sum([bool(v) for k, v in values.items() if k != "id"]) < 1:
+            raise ValueError("A minimum of 1 value will be required to do the update")
+        return values
+
+
+class BrandsBulkPatchBody(BaseModel):
+    brands: List[BrandsBulkPatchItem] = Field(..., min_items=1)
+
+    class Config:
+        extra = Extra.forbid
+
+    @validator("brands")
+    def validate_unique_ids(cls, value):
+        ids = [item.id for item in value]
+        if len(set(ids)) != len(ids):
+            raise ValueError("each id can only be present once")
+        return value
+
+
+class BulkDeleteBody(BaseModel):
+    ids: List[UUID] = Field(..., min_items=1)
+
+    class Config:
+        schema_extra = {"example": {"ids": ["c8d1f0a2-6b3e-4f5a-8c7d-9e0f1a2b3c4d"]}}
+        extra = Extra.forbid
+
+    @validator("ids")
+    def validate_unique_ids(cls, value):
+        if len(set(value)) != len(value):
+            raise ValueError("each id can only be present once")
+        return value
+
+
 class UserResponse(UserBase):
     created_at: datetime
     updated_at: datetime | None
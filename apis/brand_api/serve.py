@@ -0,0 +1,115 @@
+"""Serve the API in production, with one worker process per available CPU: python -m apis.brand_api.serve
+
+The app is imported once in the master process and forked into the workers. On SIGTERM every worker stops accepting
+connections and finishes the requests it has in flight, for up to GRACEFUL_TIMEOUT seconds, before exiting.
+"""
+import math
+import os
+from pathlib import Path
+
+from gunicorn.app.base import BaseApplication
+
+# AnyIO's default thread limiter, the most sync endpoints a worker runs at once and so the most connections it uses
+THREADPOOL_SIZE = 40
+
+
+def available_cpus() -> int:
+    """The CPUs this process may run on, capped by the cgroup CPU quota a container may have."""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (FileNotFoundError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+def worker_count() -> int:
+    """WEB_CONCURRENCY workers if set, one per available CPU otherwise."""
+    return int(os.getenv("WEB_CONCURRENCY", 0)) or available_cpus()
+
+
+def pool_size(workers: int) -> int:
+    """Each worker's share of DB_MAX_CONNECTIONS (default 90, leaving some of Postgres' 100 for everything else)."""
+    return max(1, min(THREADPOOL_SIZE, int(os.getenv("DB_MAX_CONNECTIONS", 90)) // workers))
+
+
+def post_fork(server, worker) -> None:
+    # A forked worker must never use a connection the master opened, it starts its own pools
+    from .db.database import engine, replica_engines
+
+    for forked_engine in [engine, *replica_engines]:
+        forked_engine.dispose(close=False)
+
+
+def migrate() -> None:
+    """Bring the database to the head revision of the migrations, before any worker starts.
+
+    A database with tables but no alembic_version was built by create_all, as the app did before it ran migrations,
+    so it is stamped at head instead of having its tables created again.
+    """
+    # alembic and the engine are only needed here, the workers import them with the app
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+
+    from .db.database import engine
+    from .utils.health import MIGRATIONS
+
+    # No alembic.ini, so env.py leaves the logging configured here alone
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS))
+    with engine.connect() as connection:
+        tables = set(inspect(connection).get_table_names())
+    if tables and "alembic_version" not in tables:
+        command.stamp(config, "head")
+    else:
+        command.upgrade(config, "head")
+
+
+def options(workers: int) -> dict:
+    return {
+        "bind": f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 80)}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+        "logconfig": str(Path(__file__).parent / "utils" / "log.ini"),
+        # Traefik is the only way in, the client address it forwards is the one rate limits go by
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "*"),
+        "post_fork": post_fork,
+    }
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict) -> None:
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from .main import app
+
+        return app
+
+
+def main() -> None:
+    workers = worker_count()
+    # Behind PgBouncer it caps the server connections itself and the workers keep no pool, see db/database.py
+    if os.getenv("DB_PGBOUNCER") != "true":
+        # The engine reads these when the app is imported, so they have to be set before preloading it
+        os.environ.setdefault("DB_POOL_SIZE", str(pool_size(workers)))
+        os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    # The rate limits hold across all the workers, whose buckets are made before they are forked
+    os.environ.setdefault("RATE_LIMIT_SHARED", "true")
+    # Once, here, rather than in every worker, so /readyz finds the database at head
+    migrate()
+    Server(options(workers)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
+import json
+from contextlib import contextmanager
 from re import search
 
 import pytest
+from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
 from ..db.database import SessionLocal, engine
 from ..db.models import Base, Brand, BrandSocial, Category, Role, Social, User
@@ -65,6 +69,14 @@ def token_generator(create_valid_user):
     return client.post("/login", data={"username": "validUser", "password": "ValidPassword1"}).json()["access_token"]
 
 
+@pytest.fixture
+def admin_token_generator(db_session, create_valid_role):
+    role_id = db_session.query(Role).filter(Role.name == "admin").one().id
+    db_session.add(User(username="adminUser", password=get_hashed_password("AdminPassword1"), role_id=role_id))
+    db_session.commit()
+    return client.post("/login", data={"username": "adminUser", "password": "AdminPassword1"}).json()["access_token"]
+
+
 @pytest.fixture
 def create_valid_category(db_session, create_valid_user):
     user_id = db_session.query(User).first().id
@@ -170,6 +182,31 @@ def delete_brand_social(db_session, create_valid_brand_social, token_generator):
     )
 
 
+@pytest.fixture
+def sql_statements():
+    """Record the SQL statements run inside `with sql_statements() as statements:`."""
+
+    @contextmanager
+    def record():
+        statements = []
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(" ".join(statement.split()))
+
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+    return record
+
+
+def assert_query_budget(statements: list[str], budget: int):
+    count = len(statements)
+    assert count <= budget, f"{count} statements for a budget of {budget}:\n" + "\n".join(statements)
+
+
 # TODO: Validation should probably become a class with these two as methods inside to check everything in one go
 def validate_timestamp(data, method):
     pattern = "^[0-9]{4}-[0-1]{1}[0-9]{1}-[0-3]{1}[0-9]{1}T[0-9]{2}:[0-9]{2}:[0-9]{2}.[0-9]{6}$"
@@ -222,3 +259,10 @@ def validate_ownership_keys(data, field, schema):
                 assert type(value) is dict or type(value) == str or value == None
             if key == "deleted_by":
                 assert type(value) is dict or type(value) == str or value == None
+
+
+def model_json(schema, **content) -> bytes:
+    """The bytes FastAPI would send for `content` when serialized through `schema` as the response_model."""
+    return json.dumps(
+        jsonable_encoder(schema(**content)), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
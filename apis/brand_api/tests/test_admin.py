@@ -0,0 +1,145 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from ..db.models import Brand
+from ..main import app
+from ..utils.memory import stop_tracing
+from ..utils.profiling import store_profile
+from ..utils.slow_queries import slow_queries
+
+client = TestClient(app)
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.admin
+def test_success_slow_queries(create_valid_brand, admin_token_generator, monkeypatch):
+    monkeypatch.setenv("SLOW_QUERY_MS", "0")
+    slow_queries.clear()
+    assert client.get("/brands/", params={"limit": 5}).status_code == 200
+    response = client.get("/admin/slow-queries", headers={"Authorization": "Bearer " + admin_token_generator})
+    assert response.status_code == 200
+    (brands_query,) = [query for query in response.json()["slow_queries"] if query["route"] == "GET /brands/"]
+    assert brands_query["crud_function"] == "read_all_brands_rows"
+    assert brands_query["statement"].startswith("SELECT brands.id")
+    assert set(brands_query["parameters"].values()) == {"int"}
+    assert brands_query["plan"][0]["Plan"]["Node Type"] == "Limit"
+    # The request keeps working after every statement was explained inside its transaction
+    assert client.get("/brands/").status_code == 200
+
+
+@pytest.mark.admin
+def test_success_profile_request(create_valid_brand, admin_token_generator, monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "0.1")
+    headers = {"Authorization": "Bearer " + admin_token_generator}
+    response = client.get("/brands/", headers={**headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    response = client.get("/admin/profiles", headers=headers)
+    assert [profile["id"] for profile in response.json()["profiles"]] == [profile_id]
+    assert response.json()["profiles"][0]["request"] == "GET /brands/"
+    response = client.get(f"/admin/profiles/{profile_id}", headers=headers)
+    assert response.status_code == 200
+    profile = response.json()
+    assert profile["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    functions = {
+        profile["shared"]["frames"][index]["name"]
+        for thread in profile["profiles"]
+        for sample in thread["samples"]
+        for index in sample
+    }
+    assert "get_brands" in functions or "read_all_brands_rows" in functions
+
+
+@pytest.mark.admin
+def test_success_profile_store_bounded(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_STORE_SIZE", "3")
+    for i in range(5):
+        store_profile(f"profile{i}", {"meta": {}})
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+@pytest.fixture
+def tracing():
+    yield
+    stop_tracing()
+
+
+@pytest.mark.admin
+def test_success_memory_snapshots(admin_token_generator, tracing):
+    headers = {"Authorization": "Bearer " + admin_token_generator}
+    response = client.post("/admin/memory/start", params={"frames": 5}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["tracing"] is True
+    assert response.json()["frames"] == 5
+    base_id = client.post("/admin/memory/snapshots", headers=headers).json()["id"]
+    leak = [bytearray(1024) for _ in range(1000)]
+    response = client.post("/admin/memory/snapshots", headers=headers)
+    assert response.status_code == 201
+    snapshot_id = response.json()["id"]
+    response = client.get(f"/admin/memory/snapshots/{snapshot_id}", params={"limit": 5}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["allocations"]) == 5
+    response = client.get(f"/admin/memory/snapshots/{snapshot_id}/diff/{base_id}", headers=headers)
+    assert response.status_code == 200
+    grown = response.json()["allocations"][0]
+    assert grown["traceback"][0].startswith(__file__)
+    assert grown["size_diff"] >= 1024 * 1000
+    assert grown["count_diff"] >= 1000
+    assert len(leak) == 1000
+    response = client.post("/admin/memory/stop", headers=headers)
+    assert response.json()["tracing"] is False
+    assert [snapshot["id"] for snapshot in response.json()["snapshots"]][-2:] == [base_id, snapshot_id]
+
+
+@pytest.mark.admin
+def test_success_memory_sessions(db_session, create_valid_brand, admin_token_generator):
+    brands = db_session.query(Brand).all()
+    response = client.get("/admin/memory/sessions", headers={"Authorization": "Bearer " + admin_token_generator})
+    assert response.status_code == 200
+    assert {"Brand": 1} in [
+        {key: value for key, value in session.items() if key == "Brand"} for session in response.json()["sessions"]
+    ]
+    assert REGISTRY.get_sample_value("orm_identity_map_instances") >= len(brands)
+
+
+# ERROR HANDLING
+@pytest.mark.admin
+def test_error_slow_queries_not_admin(token_generator):
+    response = client.get("/admin/slow-queries", headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 403
+
+
+@pytest.mark.admin
+def test_error_profile_not_admin(token_generator, monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    response = client.get("/brands/", headers={"Authorization": "Bearer " + token_generator, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.admin
+def test_error_profile_not_found(admin_token_generator):
+    response = client.get("/admin/profiles/missing", headers={"Authorization": "Bearer " + admin_token_generator})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Profile not found"
+
+
+@pytest.mark.admin
+def test_error_memory_snapshot_not_tracing(admin_token_generator):
+    headers = {"Authorization": "Bearer " + admin_token_generator}
+    client.post("/admin/memory/stop", headers=headers)
+    response = client.post("/admin/memory/snapshots", headers=headers)
+    assert response.status_code == 409
+    response = client.get("/admin/memory/snapshots/0", headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Snapshot not found"
+
+
+@pytest.mark.admin
+def test_error_memory_not_admin(token_generator):
+    response = client.post("/admin/memory/start", headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 403
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from ..main import app
+from ..utils.saturation import AdmissionMiddleware
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.admission
+def test_success_saturation_monitor(monkeypatch):
+    monkeypatch.setenv("MONITOR_INTERVAL_MS", "10")
+    lags = REGISTRY.get_sample_value("event_loop_lag_seconds_count") or 0
+    waits = REGISTRY.get_sample_value("threadpool_queue_wait_seconds_count") or 0
+    # Entering the client runs the startup events, which start the monitor
+    with TestClient(app) as monitored_client:
+        for _ in range(10):
+            assert monitored_client.get("/metrics").status_code == 200
+            time.sleep(0.01)
+    assert REGISTRY.get_sample_value("event_loop_lag_seconds_count") > lags
+    assert REGISTRY.get_sample_value("threadpool_queue_wait_seconds_count") > waits
+    assert REGISTRY.get_sample_value("threadpool_waiting") is not None
+
+
+class StubMonitor:
+    def __init__(self, overloaded: bool):
+        self.is_overloaded = overloaded
+
+    def overloaded(self, budget: float) -> bool:
+        return self.is_overloaded
+
+
+def admission_client(overloaded: bool, **kwargs) -> TestClient:
+    small_app = FastAPI()
+    small_app.add_middleware(AdmissionMiddleware, monitor=StubMonitor(overloaded), **kwargs)
+    small_app.add_api_route("/", lambda: {"ok": True})
+    small_app.add_api_route("/metrics", lambda: {"ok": True})
+    return TestClient(small_app)
+
+
+@pytest.mark.admission
+def test_success_admission_not_overloaded():
+    response = admission_client(False).get("/")
+    assert response.status_code == 200
+
+
+@pytest.mark.admission
+def test_success_admission_exempt():
+    response = admission_client(True, exempt=("/metrics",)).get("/metrics")
+    assert response.status_code == 200
+
+
+@pytest.mark.admission
+def test_success_admission_turned_off():
+    response = admission_client(True, max_queue_wait_ms=0).get("/")
+    assert response.status_code == 200
+
+
+# ERROR HANDLING
+@pytest.mark.admission
+def test_error_admission_overloaded():
+    shed = REGISTRY.get_sample_value("http_requests_shed_total") or 0
+    response = admission_client(True, retry_after=3).get("/")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.json()["detail"] == "The server is overloaded, try again later"
+    assert REGISTRY.get_sample_value("http_requests_shed_total") == shed + 1
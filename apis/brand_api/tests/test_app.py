@@ -1,13 +1,45 @@
+import tomllib
+
 import pytest
 from fastapi.testclient import TestClient
+from starlette.requests import Request
 
 from ..main import app
+from ..utils.rendering import CSV, JSON, MSGPACK, negotiate
 
 client = TestClient(app)
 
 methods = [client.post, client.get, client.patch, client.delete]
 
+
 # DEFAULT BEHAVIOUR
+@pytest.mark.app
+@pytest.mark.parametrize(
+    "accept,media_type",
+    [
+        (None, JSON),
+        ("*/*", JSON),
+        ("text/html", JSON),
+        ("application/msgpack", MSGPACK),
+        ("*/*, text/csv", CSV),
+        ("text/csv;q=0.5, application/json", JSON),
+        ("application/msgpack;q=0, text/*", CSV),
+    ],
+)
+def test_success_content_negotiation(accept, media_type):
+    headers = [] if accept is None else [(b"accept", accept.encode())]
+    assert negotiate(Request({"type": "http", "headers": headers})) == media_type
+
+
+@pytest.mark.app
+def test_success_openapi():
+    with open("pyproject.toml", "rb") as f:
+        version = tomllib.load(f)["tool"]["poetry"]["version"]
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    assert response.json()["info"]["version"] == version
+    assert "/brands/" in response.json()["paths"]
+    assert client.get("/openapi.json").content == response.content
 
 
 # ERROR HANDLING
@@ -1,12 +1,18 @@
+import csv
+import io
+from datetime import datetime
 from uuid import uuid4
 
+import ormsgpack
 import pytest
 from fastapi.testclient import TestClient
 
 from .. import schemas
+from ..crud import read_all_brands
 from ..db.models import Brand, Category
 from ..main import app
-from .conftest import validate_ownership_keys, validate_timestamp_and_ownership
+from ..utils import rendering
+from .conftest import model_json, validate_ownership_keys, validate_timestamp_and_ownership
 
 client = TestClient(app)
 
@@ -228,6 +234,226 @@ def test_success_one_brand_read_non_deleted(db_session, token_generator, delete_
         assert res["deleted_by"] != None
 
 
+@pytest.mark.brand
+def test_success_brands_bulk_update(db_session, token_generator, create_multiple_brands):
+    brands = db_session.query(Brand).all()
+    category_id = db_session.query(Category).first().id
+    response = client.patch(
+        "/brands/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={
+            "brands": [
+                {"id": str(brands[0].id), "category_id": str(category_id)},
+                {"id": str(brands[1].id), "category_id": str(category_id)},
+                {"id": str(brands[2].id), "city": "Porto"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert [res["id"] for res in response.json()["brands"]] == [str(brand.id) for brand in brands]
+    for res in response.json()["brands"][:2]:
+        assert res["category"]["id"] == str(category_id)
+    assert response.json()["brands"][2]["city"] == "Porto"
+    validate_ownership_keys(response.json(), "brands", schemas.BrandsResponse)
+    validate_timestamp_and_ownership(response.json()["brands"], "patch")
+
+
+@pytest.mark.brand
+def test_success_brands_bulk_delete(db_session, token_generator, create_multiple_brands):
+    brand_ids = [str(brand.id) for brand in db_session.query(Brand).all()]
+    response = client.request(
+        "DELETE", "/brands/bulk", headers={"Authorization": "Bearer " + token_generator}, json={"ids": brand_ids}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["brands"]) == 3
+    validate_ownership_keys(response.json(), "brands", schemas.BrandsResponse)
+    validate_timestamp_and_ownership(response.json()["brands"], "delete")
+    response = client.get("/brands", headers={"Authorization": "Bearer " + token_generator})
+    assert len(response.json()["brands"]) == 0
+
+
+@pytest.mark.brand
+def test_success_brand_upsert_by_name(db_session, token_generator, create_valid_category):
+    category_id = db_session.query(Category).first().id
+    put_body = {"category_id": str(category_id), "average_price": "medium", "city": "Porto"}
+    statuses = []
+    for body in [put_body, put_body, {**put_body, "city": "Lisboa"}]:
+        response = client.put(
+            "/brands/by-name/validBrandName", headers={"Authorization": "Bearer " + token_generator}, json=body
+        )
+        assert response.status_code == 200
+        assert response.json()["brands"][0]["city"] == body["city"]
+        statuses.append(response.json()["brands"][0]["status"])
+    assert statuses == ["inserted", "unchanged", "updated"]
+    assert db_session.query(Brand).count() == 1
+
+
+@pytest.mark.brand
+def test_success_brands_bulk_upsert_by_name(db_session, token_generator, create_valid_brand):
+    category_id = str(db_session.query(Category).first().id)
+    response = client.put(
+        "/brands/by-name",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={
+            "brands": [
+                {"name": "newBrandName", "category_id": category_id, "average_price": "low"},
+                {"name": "validBrandName", "category_id": category_id, "average_price": "medium", "description": "New"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert [res["status"] for res in response.json()["brands"]] == ["inserted", "updated"]
+    assert response.json()["brands"][1]["description"] == "New"
+    validate_ownership_keys(response.json(), "brands", schemas.BrandsUpsertResponse)
+
+
+@pytest.mark.brand
+def test_success_brands_read_matches_response_model(db_session, token_generator, create_multiple_brands, delete_brand):
+    response = client.get(
+        "/brands",
+        params={"show_deleted": True, "order_by": "name"},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    db_session.expire_all()
+    brands = read_all_brands(db_session, show_deleted=True, order_by="name")
+    assert response.content == model_json(schemas.ListOfBrands, brands=brands)
+
+
+@pytest.mark.brand
+def test_success_brands_read_rendered_by_database(
+    db_session, token_generator, create_multiple_brands, delete_brand, monkeypatch
+):
+    brand = db_session.query(Brand).first()
+    brand.description = 'Açores "quoted" \\ \n'
+    brand.updated_at = datetime(2023, 4, 2, 19, 25, 18)
+    db_session.commit()
+    monkeypatch.setenv("LIST_RENDERER", "database")
+    response = client.get(
+        "/brands",
+        params={"show_deleted": True, "order_by": "name"},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    db_session.expire_all()
+    brands = read_all_brands(db_session, show_deleted=True, order_by="name")
+    assert response.content == model_json(schemas.ListOfBrands, brands=brands)
+
+
+@pytest.mark.brand
+def test_success_brands_read_rendered_by_database_query_category_id(
+    db_session, token_generator, create_multiple_brands, monkeypatch
+):
+    category_id = db_session.query(Category).offset(1).first().id
+    monkeypatch.setenv("LIST_RENDERER", "database")
+    response = client.get(
+        "/brands",
+        params={"category_id": category_id, "order_by": "name", "direction": "desc"},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    assert len(response.json()["brands"]) == 2
+    brands = read_all_brands(db_session, order_by="name", direction="desc", category_id=category_id)
+    assert response.content == model_json(schemas.ListOfBrands, brands=brands)
+
+
+@pytest.mark.brand
+def test_success_brands_read_rendered_by_database_empty_page(token_generator, create_valid_brand, monkeypatch):
+    monkeypatch.setenv("LIST_RENDERER", "database")
+    response = client.get("/brands", params={"skip": 1}, headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 200
+    assert response.content == b'{"brands":[]}'
+
+
+@pytest.mark.brand
+def test_success_brands_read_msgpack(token_generator, create_multiple_brands):
+    json_response = client.get("/brands", headers={"Authorization": "Bearer " + token_generator})
+    response = client.get(
+        "/brands", headers={"Authorization": "Bearer " + token_generator, "Accept": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert ormsgpack.unpackb(response.content) == json_response.json()
+
+
+@pytest.mark.brand
+def test_success_brands_read_csv(token_generator, create_multiple_brands, monkeypatch):
+    monkeypatch.setenv("LIST_RENDERER", "database")
+    response = client.get(
+        "/brands",
+        params={"order_by": "name"},
+        headers={"Authorization": "Bearer " + token_generator, "Accept": "text/csv"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["name"] for row in rows] == ["validBrandName2", "validBrandName3", "validBrandName5"]
+    for row in rows:
+        assert row["average_price"] == "2"
+        assert row["created_by.username"] == "validUser"
+        assert row["updated_by.id"] == ""
+
+
+@pytest.mark.brand
+def test_success_brands_read_sideload_users(db_session, token_generator, create_multiple_brands, delete_brand):
+    embedded = client.get(
+        "/brands",
+        params={"show_deleted": True, "order_by": "name"},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    response = client.get(
+        "/brands",
+        params={"show_deleted": True, "order_by": "name", "sideload_users": True},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    users = data["included"]["users"]
+    assert len(users) == 1
+    for sideloaded, brand in zip(data["brands"], embedded.json()["brands"]):
+        for action in ["created", "updated", "deleted"]:
+            user = brand.pop(f"{action}_by")
+            assert sideloaded.pop(f"{action}_by_id") == (user and user["id"])
+            if user is not None:
+                assert users[user["id"]] == user
+        assert sideloaded == brand
+    assert len(response.content) < len(embedded.content)
+
+
+@pytest.mark.brand
+def test_success_brands_read_streamed(token_generator, create_multiple_brands, monkeypatch):
+    monkeypatch.setenv("MAX_PAGE_SIZE", "2")
+    monkeypatch.setattr(rendering, "STREAM_CHUNK_SIZE", 1)
+    page = client.get("/brands", params={"limit": 2}, headers={"Authorization": "Bearer " + token_generator})
+    response = client.get(
+        "/brands", params={"limit": 3, "stream": True}, headers={"Authorization": "Bearer " + token_generator}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert len(response.json()["brands"]) == 3
+    assert response.json()["brands"][:2] == page.json()["brands"]
+
+
+@pytest.mark.brand
+def test_success_brands_read_streamed_csv(token_generator, create_multiple_brands):
+    response = client.get(
+        "/brands",
+        params={"stream": True, "order_by": "name"},
+        headers={"Authorization": "Bearer " + token_generator, "Accept": "text/csv"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["name"] for row in rows] == ["validBrandName2", "validBrandName3", "validBrandName5"]
+
+
+@pytest.mark.brand
+def test_success_brands_read_streamed_empty_page(token_generator):
+    response = client.get("/brands", params={"stream": True}, headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 200
+    assert response.content == b'{"brands":[]}'
+
+
 # ERROR HANDLING
 @pytest.mark.brand
 def test_error_method_brand_not_allowed():
@@ -412,6 +638,40 @@ def test_error_brands_read_direction_incorrect(token_generator):
     )
 
 
+@pytest.mark.brand
+def test_error_brands_read_limit_over_max_page_size(token_generator, monkeypatch):
+    monkeypatch.setenv("MAX_PAGE_SIZE", "2")
+    response = client.get("/brands", params={"limit": 3}, headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 422
+    assert response.json() == {"detail": "limit can not be higher than 2, use stream=true for bigger pages"}
+
+
+@pytest.mark.brand
+def test_error_brands_read_limit_negative(token_generator):
+    response = client.get("/brands", params={"limit": -1}, headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 422
+
+
+@pytest.mark.brand
+def test_error_brands_read_streamed_msgpack(token_generator):
+    response = client.get(
+        "/brands",
+        params={"stream": True},
+        headers={"Authorization": "Bearer " + token_generator, "Accept": "application/msgpack"},
+    )
+    assert response.status_code == 406
+
+
+@pytest.mark.brand
+def test_error_brands_read_streamed_sideload_users(token_generator):
+    response = client.get(
+        "/brands",
+        params={"stream": True, "sideload_users": True},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 422
+
+
 @pytest.mark.brand
 def test_error_brands_read_query_category_id_incorrect_type(token_generator):
     response = client.get(
@@ -455,3 +715,79 @@ def test_error_brand_creation_incorrect_postal_code(db_session, token_generator,
     )
     assert response.status_code == 422
     assert response.json()["message"][0] == "postal_code: must correspond to the following format '0000-000'"
+
+
+@pytest.mark.brand
+def test_error_brands_bulk_update_brand_does_not_exist(db_session, token_generator, create_valid_brand):
+    brand_id = db_session.query(Brand).first().id
+    response = client.patch(
+        "/brands/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"brands": [{"id": str(brand_id), "city": "Porto"}, {"id": str(uuid4()), "city": "Porto"}]},
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Brand not found"
+    db_session.expire_all()
+    assert db_session.query(Brand).first().city == None
+
+
+@pytest.mark.brand
+def test_error_brands_bulk_update_category_must_exist(db_session, token_generator, create_valid_brand):
+    brand_id = db_session.query(Brand).first().id
+    response = client.patch(
+        "/brands/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"brands": [{"id": str(brand_id), "category_id": str(uuid4())}]},
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Category must exist"
+
+
+@pytest.mark.brand
+def test_error_brands_bulk_update_duplicated_id(db_session, token_generator, create_valid_brand):
+    brand_id = db_session.query(Brand).first().id
+    response = client.patch(
+        "/brands/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"brands": [{"id": str(brand_id), "city": "Porto"}, {"id": str(brand_id), "city": "Lisboa"}]},
+    )
+    assert response.status_code == 422
+    assert response.json()["message"][0] == "brands: each id can only be present once"
+
+
+@pytest.mark.brand
+def test_error_brands_bulk_delete_deleted_brand(db_session, token_generator, delete_brand):
+    brand_id = db_session.query(Brand).first().id
+    response = client.request(
+        "DELETE", "/brands/bulk", headers={"Authorization": "Bearer " + token_generator}, json={"ids": [str(brand_id)]}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Brand not found"
+
+
+@pytest.mark.brand
+def test_error_brands_bulk_upsert_category_must_exist(db_session, token_generator, create_valid_category):
+    response = client.put(
+        "/brands/by-name",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"brands": [{"name": "newBrandName", "category_id": str(uuid4())}]},
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Category must exist"
+
+
+@pytest.mark.brand
+def test_error_brands_bulk_upsert_duplicated_name(db_session, token_generator, create_valid_category):
+    category_id = str(db_session.query(Category).first().id)
+    response = client.put(
+        "/brands/by-name",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={
+            "brands": [
+                {"name": "newBrandName", "category_id": category_id},
+                {"name": "newBrandName", "category_id": category_id},
+            ]
+        },
+    )
+    assert response.status_code == 422
+    assert response.json()["message"][0] == "brands: each name can only be present once"
@@ -1,13 +1,15 @@
 from re import search
 from uuid import uuid4
 
+import ormsgpack
 import pytest
 from fastapi.testclient import TestClient
 
 from .. import schemas
+from ..crud import read_all_brand_socials
 from ..db.models import Brand, BrandSocial, Social
 from ..main import app
-from .conftest import validate_ownership_keys, validate_timestamp_and_ownership
+from .conftest import model_json, validate_ownership_keys, validate_timestamp_and_ownership
 
 client = TestClient(app)
 
@@ -32,7 +34,7 @@ key_checklist = [
 def test_success_brand_socials_create(db_session, token_generator, create_valid_brand, create_valid_social):
     brand_id = db_session.query(Brand).first().id
     social_id = db_session.query(Social).first().id
-    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
+    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-7[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
     response = client.post(
         f"/brands/{brand_id}/socials",
         headers={"Authorization": "Bearer " + token_generator},
@@ -139,6 +141,85 @@ def test_success_brands_socials_read_deleted(db_session, token_generator, delete
         assert res["deleted_by"] != None
 
 
+@pytest.mark.brandsocials
+def test_success_brand_socials_bulk_update(db_session, token_generator, create_valid_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    brand_socials_id = db_session.query(BrandSocial).first().id
+    response = client.patch(
+        f"/brands/{brand_id}/socials/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"socials": [{"id": str(brand_socials_id), "address": "www.newwebsite.com"}]},
+    )
+    assert response.status_code == 200
+    for res in response.json()["socials"]:
+        assert res["address"] == "www.newwebsite.com"
+    validate_ownership_keys(response.json(), "socials", schemas.BrandSocialsResponse)
+    validate_timestamp_and_ownership(response.json()["socials"], "patch")
+
+
+@pytest.mark.brandsocials
+def test_success_brand_socials_bulk_delete(db_session, token_generator, create_valid_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    brand_socials_id = db_session.query(BrandSocial).first().id
+    response = client.request(
+        "DELETE",
+        f"/brands/{brand_id}/socials/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"ids": [str(brand_socials_id)]},
+    )
+    assert response.status_code == 200
+    assert len(response.json()["socials"]) == 1
+    validate_ownership_keys(response.json(), "socials", schemas.BrandSocialsResponse)
+    validate_timestamp_and_ownership(response.json()["socials"], "delete")
+
+
+@pytest.mark.brandsocials
+def test_success_brand_socials_read_sideload_users(db_session, token_generator, delete_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    response = client.get(
+        f"/brands/{brand_id}/socials",
+        params={"show_deleted": True, "sideload_users": True},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    social = data["socials"][0]
+    assert "created_by" not in social
+    assert social["created_by_id"] == social["deleted_by_id"]
+    assert social["updated_by_id"] is None
+    assert data["included"]["users"] == {
+        social["created_by_id"]: {"id": social["created_by_id"], "username": "validUser", "info": None}
+    }
+
+
+@pytest.mark.brandsocials
+def test_success_brand_socials_read_matches_response_model(db_session, token_generator, delete_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    response = client.get(
+        f"/brands/{brand_id}/socials",
+        params={"show_deleted": True},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert response.content == model_json(
+        schemas.ListOfBrandSocials, socials=read_all_brand_socials(db_session, brand_id, show_deleted=True)
+    )
+
+
+@pytest.mark.brandsocials
+def test_success_brand_socials_read_msgpack(db_session, token_generator, create_valid_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    json_response = client.get(f"/brands/{brand_id}/socials", headers={"Authorization": "Bearer " + token_generator})
+    response = client.get(
+        f"/brands/{brand_id}/socials",
+        headers={"Authorization": "Bearer " + token_generator, "Accept": "application/x-msgpack, */*;q=0.5"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert ormsgpack.unpackb(response.content) == json_response.json()
+
+
 # ERROR HANDLING
 @pytest.mark.brandsocials
 def test_error_method_not_allowed(db_session, create_valid_brand):
@@ -262,3 +343,29 @@ def test_error_update_social_wrong_type(db_session, token_generator, create_vali
     )
     assert response.status_code == 422
     assert response.json()["message"][0] == "social_id: value is not a valid uuid"
+
+
+@pytest.mark.brandsocials
+def test_error_bulk_update_social_doesnt_exist(db_session, token_generator, create_valid_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    brand_socials_id = db_session.query(BrandSocial).first().id
+    response = client.patch(
+        f"/brands/{brand_id}/socials/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"socials": [{"id": str(brand_socials_id), "social_id": f"{uuid4()}"}]},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Social must exist."
+
+
+@pytest.mark.brandsocials
+def test_error_bulk_delete_brand_social_not_found(db_session, token_generator, create_valid_brand_social):
+    brand_id = db_session.query(Brand).first().id
+    response = client.request(
+        "DELETE",
+        f"/brands/{brand_id}/socials/bulk",
+        headers={"Authorization": "Bearer " + token_generator},
+        json={"ids": [f"{uuid4()}"]},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "This social was not found associated with this brand"
@@ -5,9 +5,10 @@ import pytest
 from fastapi.testclient import TestClient
 
 from .. import schemas
+from ..crud import read_all_categories
 from ..db.models import Category
 from ..main import app
-from .conftest import validate_ownership_keys, validate_timestamp_and_ownership
+from .conftest import model_json, validate_ownership_keys, validate_timestamp_and_ownership
 
 client = TestClient(app)
 
@@ -18,7 +19,7 @@ methods_category_id = [client.post]
 # DEFAULT BEHAVIOUR
 @pytest.mark.categories
 def test_success_categories_create(token_generator):
-    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
+    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-7[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
     response = client.post(
         "/categories",
         headers={"Authorization": "Bearer " + token_generator},
@@ -142,6 +143,46 @@ def test_success_one_category_read_non_deleted(db_session, token_generator, dele
         assert res["deleted_by"] != None
 
 
+@pytest.mark.categories
+def test_success_categories_read_matches_response_model(db_session, token_generator, delete_category):
+    response = client.get(
+        "/categories", params={"show_deleted": True}, headers={"Authorization": "Bearer " + token_generator}
+    )
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert response.content == model_json(
+        schemas.ListOfCategories, categories=read_all_categories(db_session, show_deleted=True)
+    )
+
+
+@pytest.mark.categories
+def test_success_categories_read_sideload_users(token_generator, create_multiple_categories, monkeypatch):
+    monkeypatch.setenv("LIST_RENDERER", "database")
+    response = client.get(
+        "/categories", params={"sideload_users": True}, headers={"Authorization": "Bearer " + token_generator}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["categories"]) == 3
+    user_ids = {category["created_by_id"] for category in data["categories"]}
+    assert set(data["included"]["users"]) == user_ids
+
+
+@pytest.mark.categories
+def test_success_categories_read_rendered_by_database(
+    db_session, token_generator, create_multiple_categories, monkeypatch
+):
+    monkeypatch.setenv("LIST_RENDERER", "database")
+    response = client.get(
+        "/categories",
+        params={"order_by": "name", "direction": "desc", "limit": 2},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    categories = read_all_categories(db_session, limit=2, order_by="name", direction="desc")
+    assert response.content == model_json(schemas.ListOfCategories, categories=categories)
+
+
 # ERROR HANDLING
 @pytest.mark.categories
 def test_error_method_not_allowed_categories():
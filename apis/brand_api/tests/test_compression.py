@@ -0,0 +1,105 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from ..utils.compression import BROTLI, GZIP, CompressedBodies, CompressionMiddleware, negotiate_encoding
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.compression
+@pytest.mark.parametrize(
+    "accept_encoding,encoding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip, deflate", GZIP),
+        ("gzip, deflate, br", BROTLI),
+        ("br;q=0.5, gzip", GZIP),
+        ("*", BROTLI),
+        ("*, br;q=0", GZIP),
+        ("gzip;q=0", None),
+    ],
+)
+def test_success_encoding_negotiation(accept_encoding, encoding):
+    assert negotiate_encoding(accept_encoding) == encoding
+
+
+compressed_app = FastAPI()
+compressed_app.add_middleware(CompressionMiddleware, minimum_size=100)
+page = b'{"brands":[' + b",".join([b'{"name":"validBrandName"}'] * 50) + b"]}"
+
+
+@compressed_app.get("/page")
+def get_page():
+    return Response(page, media_type="application/json")
+
+
+@compressed_app.get("/small")
+def get_small():
+    return Response(b'{"brands":[]}', media_type="application/json")
+
+
+@compressed_app.get("/stream")
+def get_stream():
+    return StreamingResponse(iter([page[:500], page[500:]]), media_type="application/json")
+
+
+compressed_client = TestClient(compressed_app)
+
+
+@pytest.mark.compression
+@pytest.mark.parametrize("encoding,decompress", [(GZIP, gzip.decompress), (BROTLI, brotli.decompress)])
+def test_success_compression(encoding, decompress):
+    response = compressed_client.get("/page", headers={"Accept-Encoding": encoding})
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(page)
+    assert response.content == page
+
+
+@pytest.mark.compression
+@pytest.mark.parametrize("encoding", [GZIP, BROTLI])
+def test_success_compression_streamed(encoding):
+    response = compressed_client.get("/stream", headers={"Accept-Encoding": encoding})
+    assert response.headers["content-encoding"] == encoding
+    assert "content-length" not in response.headers
+    assert response.content == page
+
+
+@pytest.mark.compression
+def test_success_compressed_bodies_cache():
+    calls = []
+
+    def compress(encoding, body):
+        calls.append((encoding, body))
+        return body[::-1]
+
+    cache = CompressedBodies(maxsize=2)
+    assert cache.get(GZIP, b"first", compress) == b"tsrif"
+    assert cache.get(GZIP, b"first", compress) == b"tsrif"
+    assert cache.get(BROTLI, b"first", compress) == b"tsrif"
+    assert len(calls) == 2
+    # Least recently used goes first
+    cache.get(GZIP, b"second", compress)
+    cache.get(BROTLI, b"first", compress)
+    cache.get(GZIP, b"first", compress)
+    assert calls[-1] == (GZIP, b"first")
+    assert len(calls) == 4
+
+
+@pytest.mark.compression
+def test_success_compression_under_minimum_size():
+    response = compressed_client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b'{"brands":[]}'
+
+
+@pytest.mark.compression
+def test_success_compression_not_accepted():
+    response = compressed_client.get("/page", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == page
@@ -0,0 +1,147 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import RFC_4122
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text, update
+from sqlalchemy.pool import NullPool
+
+from ..crud import read_all_brands_rows
+from ..db.database import SAFE_METHODS, SessionLocal, engine, engine_for, session_for
+from ..db.models import Brand, BrandSocial, Category, Social, User, uuid7
+from ..main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def transaction_modes():
+    """The (autocommit, readonly, deferrable) mode of the connection behind every statement run while it is used."""
+    modes = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        dbapi_connection = conn.connection.dbapi_connection
+        modes.append((dbapi_connection.autocommit, bool(dbapi_connection.readonly), bool(dbapi_connection.deferrable)))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield modes
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.database
+def test_success_read_only_sessions(create_valid_brand, transaction_modes):
+    response = client.get("/brands/")
+    assert response.status_code == 200
+    assert transaction_modes and set(transaction_modes) == {(True, False, False)}
+
+
+@pytest.mark.database
+def test_success_read_write_sessions(token_generator, transaction_modes):
+    response = client.post(
+        "/categories/", headers={"Authorization": "Bearer " + token_generator}, json={"name": "Read write"}
+    )
+    assert response.status_code == 201
+    assert transaction_modes and set(transaction_modes) == {(False, False, False)}
+
+
+@pytest.mark.database
+def test_success_read_only_exports(create_valid_brand, transaction_modes):
+    response = client.get("/brands/?stream=true")
+    assert response.status_code == 200
+    assert len(response.json()["brands"]) == 1
+    assert (False, True, True) in transaction_modes
+
+
+@pytest.mark.database
+def test_success_read_only_sessions_write_to_primary(db_session, create_valid_brand, transaction_modes):
+    with session_for("GET") as db:
+        brand = db.query(Brand).one()
+        brand.city = "Porto"
+        db.commit()
+    assert transaction_modes[0] == (True, False, False)
+    assert transaction_modes[-1] == (False, False, False)
+    db_session.expire_all()
+    assert db_session.query(Brand).one().city == "Porto"
+
+
+def read_and_write(bind) -> None:
+    """Reads, exports and writes, the way the requests of every method use a session."""
+    for method in ["GET", "POST"] * 5:
+        with SessionLocal(bind=bind, info={"read_only": method in SAFE_METHODS}) as db:
+            assert len(read_all_brands_rows(db)) == 1
+            assert len(list(read_all_brands_rows(db, yield_per=10))) == 1
+            db.execute(update(Brand).values(city=method))
+            db.commit()
+
+
+def session_settings(bind) -> list:
+    with bind.connect() as connection:
+        return connection.execute(text("SELECT name, setting FROM pg_settings WHERE source = 'session'")).all()
+
+
+def backend_pid(bind) -> int:
+    with bind.connect() as connection:
+        return connection.execute(text("SELECT pg_backend_pid()")).scalar()
+
+
+@pytest.mark.database
+def test_success_pgbouncer_engine(monkeypatch):
+    monkeypatch.setenv("DB_PGBOUNCER", "true")
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    assert isinstance(engine_for(str(engine.url)).pool, NullPool)
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    assert engine_for(str(engine.url)).pool.size() == 2
+
+
+@pytest.mark.database
+def test_success_no_session_state(create_valid_brand):
+    read_and_write(engine)
+    assert session_settings(engine) == []
+
+
+@pytest.fixture
+def pgbouncer_engine(monkeypatch):
+    url = os.getenv("PGBOUNCER_DATABASE_URL")
+    if not url:
+        pytest.skip("PGBOUNCER_DATABASE_URL is not set, the test compose file runs PgBouncer")
+    monkeypatch.setenv("DB_PGBOUNCER", "true")
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    pgbouncer_engine = engine_for(url)
+    yield pgbouncer_engine
+    pgbouncer_engine.dispose()
+
+
+@pytest.mark.database
+def test_success_pgbouncer(create_valid_brand, pgbouncer_engine):
+    # More threads than PgBouncer's server connections, so their transactions take turns on the same ones
+    with ThreadPoolExecutor(8) as executor:
+        for future in [executor.submit(read_and_write, pgbouncer_engine) for _ in range(8)]:
+            future.result()
+    assert session_settings(pgbouncer_engine) == []
+    # Connected straight to Postgres every new connection would be a new backend, through PgBouncer they share a few
+    assert len({backend_pid(pgbouncer_engine) for _ in range(10)}) < 10
+
+
+@pytest.mark.database
+def test_success_uuid7():
+    ids = [uuid7() for _ in range(10000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert {(key.version, key.variant) for key in ids} == {(7, RFC_4122)}
+    assert abs((ids[-1].int >> 80) - time.time() * 1000) < 1000
+
+
+@pytest.mark.database
+def test_success_uuid7_clock_backwards(monkeypatch):
+    first = uuid7()
+    monkeypatch.setattr(time, "time_ns", lambda: (first.int >> 80) * 1_000_000 - 10**9)
+    assert uuid7() > first
+
+
+@pytest.mark.database
+def test_success_uuid7_primary_keys(db_session, create_valid_brand_social):
+    for model in [User, Category, Brand, Social, BrandSocial]:
+        assert db_session.query(model).first().id.version == 7
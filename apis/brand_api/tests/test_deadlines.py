@@ -0,0 +1,110 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+
+from ..db.database import DeadlineExceeded, engine, request_deadline, session_for
+from ..main import app
+from ..utils.deadlines import REQUEST_TIMEOUT_HEADER, DeadlineMiddleware, route_timeouts
+
+client = TestClient(app)
+
+
+def deadline_client(**kwargs) -> TestClient:
+    deadline_app = FastAPI()
+
+    @deadline_app.get("/slow")
+    @deadline_app.get("/fast")
+    def get_timeout():
+        deadline = request_deadline.get()
+        return {"timeout": None if deadline is None else round((deadline - time.monotonic()) * 1000, -2)}
+
+    @deadline_app.get("/export")
+    def get_export():
+        db = session_for("GET")
+        # The first row comes at once, every other one takes longer than the whole deadline
+        rows = db.execute(
+            text(
+                "SELECT n FROM generate_series(1, 3) n, pg_sleep(CASE WHEN n > 1 THEN 0.3 ELSE 0 END)"
+            ).execution_options(yield_per=1)
+        )
+
+        def body():
+            try:
+                for row in rows:
+                    deadline = request_deadline.get()
+                    yield f"{row.n} {deadline}\n"
+            finally:
+                db.close()
+
+        return StreamingResponse(body(), media_type="text/csv")
+
+    deadline_app.add_middleware(DeadlineMiddleware, **kwargs)
+    return TestClient(deadline_app)
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.deadlines
+@pytest.mark.parametrize(
+    "path,headers,timeout",
+    [
+        ("/fast", {}, 1000),
+        ("/slow", {}, 5000),
+        ("/fast", {REQUEST_TIMEOUT_HEADER: "200"}, 200),
+        ("/fast", {REQUEST_TIMEOUT_HEADER: "9000"}, 1000),
+        ("/fast", {REQUEST_TIMEOUT_HEADER: "soon"}, 1000),
+    ],
+)
+def test_success_request_deadlines(path, headers, timeout):
+    timeouts_client = deadline_client(timeout_ms=1000, route_timeouts_ms=route_timeouts("/slow=5000"))
+    assert timeouts_client.get(path, headers=headers).json() == {"timeout": timeout}
+
+
+@pytest.mark.deadlines
+def test_success_streamed_past_deadline(db_session):
+    response = deadline_client(timeout_ms=200).get("/export")
+    assert response.status_code == 200
+    assert response.text == "1 None\n2 None\n3 None\n"
+
+
+@pytest.mark.deadlines
+def test_success_no_request_deadline():
+    assert deadline_client(timeout_ms=0).get("/fast").json() == {"timeout": None}
+    response = deadline_client(timeout_ms=0).get("/fast", headers={REQUEST_TIMEOUT_HEADER: "300"})
+    assert response.json() == {"timeout": 300}
+
+
+@pytest.mark.deadlines
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_success_statement_timeout(method):
+    token = request_deadline.set(time.monotonic() + 0.2)
+    start = time.monotonic()
+    try:
+        with session_for(method) as db, pytest.raises(DeadlineExceeded):
+            db.execute(text("SELECT pg_sleep(5)"))
+    finally:
+        request_deadline.reset(token)
+    assert time.monotonic() - start < 1
+    assert engine.pool.checkedout() == 0
+    # SET LOCAL ended with the statement, nothing outlives the request
+    with session_for(method) as db:
+        assert db.execute(text("SHOW statement_timeout")).scalar() == "0"
+
+
+# ERROR HANDLING
+@pytest.mark.deadlines
+def test_error_deadline_exceeded(create_valid_brand):
+    def slow_statement(*args):
+        time.sleep(0.1)
+
+    event.listen(engine, "before_cursor_execute", slow_statement)
+    try:
+        response = client.get("/brands/", headers={REQUEST_TIMEOUT_HEADER: "50"})
+    finally:
+        event.remove(engine, "before_cursor_execute", slow_statement)
+    assert response.status_code == 504
+    assert response.json() == {"detail": "The request did not finish before its deadline"}
+    assert engine.pool.checkedout() == 0
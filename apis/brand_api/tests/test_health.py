@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+
+from ..db.database import engine
+from ..main import app
+from ..serve import migrate
+from ..utils.health import migration_heads
+from ..utils.rate_limits import RateLimitMiddleware, rate_limits
+from ..utils.warmup import warm_request
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def alembic_version(db_session):
+    db_session.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+    db_session.commit()
+    yield db_session
+    db_session.execute(text("DROP TABLE alembic_version"))
+    db_session.commit()
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.health
+def test_success_healthz():
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+@pytest.mark.health
+def test_success_readyz(alembic_version, monkeypatch):
+    monkeypatch.setenv("READINESS_CACHE_SECONDS", "0")
+    monkeypatch.setenv("WARMUP_CONNECTIONS", "3")
+    for head in migration_heads():
+        alembic_version.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+    alembic_version.commit()
+    # Entering the client runs the startup, which renders the OpenAPI schema and warms up
+    with TestClient(app) as started_client:
+        response = started_client.get("/readyz")
+    assert response.status_code == 200
+    checks = response.json()["checks"]
+    assert checks["database"]["ok"] is True
+    assert checks["database"]["pool"]["checked_out"] >= 0
+    assert checks["migrations"]["current"] == checks["migrations"]["head"] == migration_heads()
+    assert checks["caches"]["openapi"] is True
+    assert checks["caches"]["warm_up"]["connections"] == min(3, engine.pool.size())
+
+
+@pytest.mark.health
+def test_success_readyz_cached(alembic_version, monkeypatch):
+    monkeypatch.setenv("READINESS_CACHE_SECONDS", "0")
+    checked_at = client.get("/readyz").json()["checked_at"]
+    assert client.get("/readyz").json()["checked_at"] != checked_at
+    monkeypatch.setenv("READINESS_CACHE_SECONDS", "60")
+    checked_at = client.get("/readyz").json()["checked_at"]
+    assert client.get("/readyz").json()["checked_at"] == checked_at
+
+
+@pytest.mark.health
+def test_success_migrate(db_session):
+    # Tables made by create_all and no alembic_version, as the app left the database before it ran migrations
+    migrate()
+    current = [row.version_num for row in db_session.execute(text("SELECT version_num FROM alembic_version"))]
+    assert current == migration_heads()
+    # At head already, upgrading is a no-op
+    migrate()
+    assert [row.version_num for row in db_session.execute(text("SELECT version_num FROM alembic_version"))] == current
+    db_session.execute(text("DROP TABLE alembic_version"))
+    db_session.commit()
+
+
+@pytest.mark.health
+def test_success_warm_up(db_session, monkeypatch):
+    monkeypatch.setenv("WARMUP_CONNECTIONS", "3")
+    monkeypatch.setenv("WARMUP_PATHS", "/categories/, /brands/")
+    labels = {"method": "GET", "route": "/categories/", "status": "200"}
+    requests = REGISTRY.get_sample_value("http_requests_total", labels)
+    with TestClient(app):
+        warm_up = app.state.warm_up
+        assert engine.pool.checkedin() >= 3
+    assert warm_up["connections"] == 3
+    assert warm_up["requests"] == {
+        "/categories/ (br)": 200,
+        "/categories/ (gzip)": 200,
+        "/brands/ (br)": 200,
+        "/brands/ (gzip)": 200,
+    }
+    # Warming up is not client traffic
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == requests
+
+
+@pytest.mark.health
+def test_success_rate_limit_warm_up():
+    limited_app = FastAPI()
+    limited_app.add_api_route("/brands/{brand_id}", lambda brand_id: {})
+    limited_app.add_middleware(RateLimitMiddleware, limits=rate_limits("/brands/{brand_id}=2/60"))
+    statuses = [asyncio.run(warm_request(limited_app, "/brands/1", "gzip")) for _ in range(3)]
+    assert statuses == [200, 200, 200]
+
+
+# ERROR HANDLING
+@pytest.mark.health
+def test_error_readyz_migrations_behind(alembic_version, monkeypatch):
+    monkeypatch.setenv("READINESS_CACHE_SECONDS", "0")
+    alembic_version.execute(text("INSERT INTO alembic_version VALUES ('0001')"))
+    alembic_version.commit()
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+    assert response.json()["checks"]["migrations"] == {"ok": False, "head": migration_heads(), "current": ["0001"]}
+
+
+@pytest.mark.health
+def test_error_readyz_not_migrated(db_session, monkeypatch):
+    monkeypatch.setenv("READINESS_CACHE_SECONDS", "0")
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["migrations"]["current"] == []
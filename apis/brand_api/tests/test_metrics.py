@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from ..db.models import Brand
+from ..main import app
+
+client = TestClient(app)
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.metrics
+def test_success_metrics(create_valid_brand):
+    request_labels = {"method": "GET", "route": "/brands/", "status": "200"}
+    db_labels = {"method": "GET", "route": "/brands/"}
+    requests = REGISTRY.get_sample_value("http_requests_total", request_labels) or 0
+    queries = REGISTRY.get_sample_value("http_request_db_queries_sum", db_labels) or 0
+    assert client.get("/brands/").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert REGISTRY.get_sample_value("http_requests_total", request_labels) == requests + 1
+    assert REGISTRY.get_sample_value("http_request_duration_seconds_count", request_labels) >= 1
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", db_labels) > queries
+    assert REGISTRY.get_sample_value("db_pool_checked_out") is not None
+    assert REGISTRY.get_sample_value("threadpool_size") == 40
+    assert 'route="/brands/"' in response.text
+
+
+@pytest.mark.metrics
+def test_success_metrics_unmatched_route():
+    labels = {"method": "GET", "route": "unmatched", "status": "404"}
+    requests = REGISTRY.get_sample_value("http_requests_total", labels) or 0
+    assert client.get("/does-not-exist").status_code == 404
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == requests + 1
+
+
+@pytest.mark.metrics
+def test_success_server_timing(create_valid_brand):
+    response = client.get("/brands/")
+    timings = dict(metric.split(";dur=") for metric in response.headers["server-timing"].split(", "))
+    assert set(timings) == {"db", "app", "total"}
+    assert float(timings["db"]) > 0
+    assert float(timings["total"]) >= float(timings["db"])
+
+
+@pytest.mark.metrics
+def test_success_repeated_statements_logged(db_session, create_valid_brand, monkeypatch, caplog):
+    monkeypatch.setenv("N_PLUS_ONE_THRESHOLD", "2")
+    brand_id = db_session.query(Brand).first().id
+    # The brand is read once to check it exists and once more for the response
+    assert client.get(f"/brands/{brand_id}").status_code == 200
+    warnings = [record.message for record in caplog.records if record.levelname == "WARNING"]
+    assert len(warnings) == 1
+    assert warnings[0].startswith("Possible N+1 on GET /brands/{brand_id}, ran 2 times: SELECT brands.id")
@@ -0,0 +1,201 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from ..benchmarks.seed import seed
+from ..db.models import Brand, BrandSocial, Category, Social, User
+from ..main import app
+from .conftest import assert_query_budget
+
+client = TestClient(app)
+
+# A route's budget is the most SQL statements it may run for one request, whatever the size of the page. Raise one
+# only when the route genuinely needs more work, never to let lazy loads back in.
+LIST_BUDGETS = [
+    pytest.param("/brands/", {}, 1, marks=pytest.mark.brand, id="GET /brands"),
+    pytest.param("/brands/", {"sideload_users": True}, 2, marks=pytest.mark.brand, id="GET /brands sideloaded"),
+    pytest.param("/brands/", {"stream": True}, 1, marks=pytest.mark.brand, id="GET /brands streamed"),
+    pytest.param("/categories/", {}, 1, marks=pytest.mark.categories, id="GET /categories"),
+    pytest.param("/socials/", {}, 2, marks=pytest.mark.socials, id="GET /socials"),
+    pytest.param("/users/", {}, 2, marks=pytest.mark.user, id="GET /users"),
+    pytest.param("/brands/{brand_id}/socials/", {}, 1, marks=pytest.mark.brandsocials, id="GET /brands/socials"),
+]
+
+ROUTE_BUDGETS = [
+    pytest.param("get", "/brands/{brand_id}", None, 5, marks=pytest.mark.brand, id="GET /brands/{brand_id}"),
+    pytest.param(
+        "post",
+        "/brands/",
+        lambda ids: {"name": "budgetBrand", "category_id": ids["category_id"], "average_price": "medium"},
+        7,
+        marks=pytest.mark.brand,
+        id="POST /brands",
+    ),
+    pytest.param(
+        "patch",
+        "/brands/{brand_id}",
+        lambda ids: {"category_id": ids["category_id"]},
+        8,
+        marks=pytest.mark.brand,
+        id="PATCH /brands/{brand_id}",
+    ),
+    pytest.param("delete", "/brands/{brand_id}", None, 8, marks=pytest.mark.brand, id="DELETE /brands/{brand_id}"),
+    pytest.param(
+        "patch",
+        "/brands/bulk",
+        lambda ids: {"brands": [{"id": brand_id, "city": f"Braga {i}"} for i, brand_id in enumerate(ids["brand_ids"])]},
+        6,
+        marks=pytest.mark.brand,
+        id="PATCH /brands/bulk",
+    ),
+    pytest.param(
+        "delete",
+        "/brands/bulk",
+        lambda ids: {"ids": ids["brand_ids"]},
+        7,
+        marks=pytest.mark.brand,
+        id="DELETE /brands/bulk",
+    ),
+    pytest.param(
+        "put",
+        "/brands/by-name/benchBrand1",
+        lambda ids: {"category_id": ids["category_id"], "average_price": "high"},
+        7,
+        marks=pytest.mark.brand,
+        id="PUT /brands/by-name/{name}",
+    ),
+    pytest.param(
+        "put",
+        "/brands/by-name",
+        lambda ids: {
+            "brands": [
+                {"name": f"benchBrand{i}", "category_id": ids["category_id"], "average_price": "high"}
+                for i in range(50, 150)
+            ]
+        },
+        7,
+        marks=pytest.mark.brand,
+        id="PUT /brands/by-name",
+    ),
+    pytest.param(
+        "get", "/categories/{category_id}", None, 3, marks=pytest.mark.categories, id="GET /categories/{category_id}"
+    ),
+    pytest.param(
+        "post",
+        "/categories/",
+        lambda ids: {"name": "budgetCategory"},
+        5,
+        marks=pytest.mark.categories,
+        id="POST /categories",
+    ),
+    pytest.param(
+        "patch",
+        "/categories/{category_id}",
+        lambda ids: {"name": "budgetCategory"},
+        7,
+        marks=pytest.mark.categories,
+        id="PATCH /categories/{category_id}",
+    ),
+    pytest.param(
+        "delete",
+        "/categories/{category_id}",
+        None,
+        7,
+        marks=pytest.mark.categories,
+        id="DELETE /categories/{category_id}",
+    ),
+    pytest.param(
+        "post", "/socials/", lambda ids: {"name": "budgetSocial"}, 4, marks=pytest.mark.socials, id="POST /socials"
+    ),
+    pytest.param("get", "/users/{user_id}", None, 4, marks=pytest.mark.user, id="GET /users/{user_id}"),
+    pytest.param(
+        "patch",
+        "/users/{user_id}",
+        lambda ids: {"email": "budget@duodinamico.online"},
+        7,
+        marks=pytest.mark.user,
+        id="PATCH /users/{user_id}",
+    ),
+    pytest.param("delete", "/users/{user_id}", None, 7, marks=pytest.mark.user, id="DELETE /users/{user_id}"),
+    pytest.param(
+        "post",
+        "/brands/{brand_id}/socials/",
+        lambda ids: {"social_id": ids["social_id"], "address": "www.budget.pt"},
+        9,
+        marks=pytest.mark.brandsocials,
+        id="POST /brands/socials",
+    ),
+    pytest.param(
+        "patch",
+        "/brands/{brand_id}/socials/{brand_social_id}",
+        lambda ids: {"social_id": ids["social_id"]},
+        11,
+        marks=pytest.mark.brandsocials,
+        id="PATCH /brands/socials/{brand_social_id}",
+    ),
+    pytest.param(
+        "delete",
+        "/brands/{brand_id}/socials/{brand_social_id}",
+        None,
+        10,
+        marks=pytest.mark.brandsocials,
+        id="DELETE /brands/socials/{brand_social_id}",
+    ),
+    pytest.param(
+        "patch",
+        "/brands/{brand_id}/socials/bulk",
+        lambda ids: {
+            "socials": [
+                {"id": social_id, "address": f"www.budget{i}.pt"} for i, social_id in enumerate(ids["brand_social_ids"])
+            ]
+        },
+        9,
+        marks=pytest.mark.brandsocials,
+        id="PATCH /brands/socials/bulk",
+    ),
+    pytest.param(
+        "delete",
+        "/brands/{brand_id}/socials/bulk",
+        lambda ids: {"ids": ids["brand_social_ids"]},
+        9,
+        marks=pytest.mark.brandsocials,
+        id="DELETE /brands/socials/bulk",
+    ),
+]
+
+
+@pytest.fixture
+def seeded_ids(db_session, create_valid_user) -> dict:
+    brand_id = seed(db_session)
+    return {
+        "brand_id": str(brand_id),
+        "brand_ids": [str(brand_id) for brand_id, in db_session.query(Brand.id).order_by(Brand.name)],
+        "category_id": str(db_session.query(Category.id).first().id),
+        "social_id": str(db_session.query(Social.id).first().id),
+        "brand_social_id": str(db_session.query(BrandSocial.id).first().id),
+        "brand_social_ids": [str(brand_social_id) for brand_social_id, in db_session.query(BrandSocial.id)],
+        "user_id": str(db_session.query(User.id).filter(User.username == "benchUser10").one().id),
+    }
+
+
+@pytest.mark.parametrize("limit", [1, 100])
+@pytest.mark.parametrize("path,params,budget", LIST_BUDGETS)
+def test_success_list_query_budget(seeded_ids, token_generator, sql_statements, path, params, budget, limit):
+    with sql_statements() as statements:
+        response = client.get(
+            path.format(**seeded_ids),
+            params={**params, "limit": limit},
+            headers={"Authorization": "Bearer " + token_generator},
+        )
+    assert response.status_code == 200
+    assert_query_budget(statements, budget)
+
+
+@pytest.mark.parametrize("method,path,body,budget", ROUTE_BUDGETS)
+def test_success_route_query_budget(seeded_ids, token_generator, sql_statements, method, path, body, budget):
+    kwargs = {} if body is None else {"json": body(seeded_ids)}
+    with sql_statements() as statements:
+        response = client.request(
+            method, path.format(**seeded_ids), headers={"Authorization": "Bearer " + token_generator}, **kwargs
+        )
+    assert response.status_code in (200, 201), response.text
+    assert_query_budget(statements, budget)
@@ -0,0 +1,91 @@
+import multiprocessing
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from ..utils.rate_limits import LocalBuckets, RateLimit, RateLimitMiddleware, SharedBuckets, rate_limits
+from ..utils.tokens import create_access_token
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.ratelimits
+@pytest.mark.parametrize("buckets", [LocalBuckets, SharedBuckets])
+def test_success_token_buckets(buckets):
+    bucket = buckets()
+    limit = RateLimit(3, 60)
+    assert [bucket.take("client", limit, 100.0) for _ in range(4)] == [(True, 2), (True, 1), (True, 0), (False, 0)]
+    # Another client has a bucket of its own, and the first one gets a token back every 20 seconds
+    assert bucket.take("other", limit, 100.0) == (True, 2)
+    assert bucket.take("client", limit, 130.0) == (True, 0.5)
+    assert bucket.take("client", limit, 1000.0) == (True, 2)
+
+
+@pytest.mark.ratelimits
+def test_success_token_buckets_least_recently_used():
+    bucket = LocalBuckets(size=2)
+    limit = RateLimit(1, 60)
+    bucket.take("first", limit, 100.0)
+    bucket.take("second", limit, 100.0)
+    bucket.take("third", limit, 100.0)
+    assert list(bucket.buckets) == ["second", "third"]
+
+
+@pytest.mark.ratelimits
+def test_success_shared_token_buckets():
+    bucket = SharedBuckets()
+    limit = RateLimit(2, 60)
+    worker = multiprocessing.get_context("fork").Process(target=bucket.take, args=("client", limit, 100.0))
+    worker.start()
+    worker.join()
+    assert bucket.take("client", limit, 100.0) == (True, 0)
+
+
+def rate_limited_client(buckets=None) -> TestClient:
+    limited_app = FastAPI()
+
+    @limited_app.get("/brands/{brand_id}")
+    @limited_app.get("/unlimited")
+    def get_anything():
+        return {}
+
+    limited_app.add_middleware(RateLimitMiddleware, limits=rate_limits("/brands/{brand_id}=2/60"), buckets=buckets)
+    return TestClient(limited_app)
+
+
+@pytest.mark.ratelimits
+def test_success_rate_limit_headers():
+    response = rate_limited_client().get("/brands/1")
+    assert response.status_code == 200
+    assert response.headers["RateLimit-Limit"] == "2"
+    assert response.headers["RateLimit-Remaining"] == "1"
+    assert response.headers["RateLimit-Reset"] == "30"
+    assert response.headers["RateLimit-Policy"] == "2;w=60"
+    assert "RateLimit-Limit" not in rate_limited_client().get("/unlimited").headers
+
+
+@pytest.mark.ratelimits
+def test_success_rate_limit_per_client():
+    limited_client = rate_limited_client()
+    # Routes are limited by template, and every client with a valid token by its subject
+    for path in ["/brands/1", "/brands/2"]:
+        assert limited_client.get(path).status_code == 200
+    for subject in ["validUser", "otherUser"]:
+        headers = {"Authorization": "Bearer " + create_access_token(subject)}
+        assert limited_client.get("/brands/1", headers=headers).status_code == 200
+    assert limited_client.get("/brands/1", headers={"Authorization": "Bearer forged"}).status_code == 429
+
+
+# ERROR HANDLING
+@pytest.mark.ratelimits
+def test_error_rate_limited():
+    limited_client = rate_limited_client()
+    for _ in range(2):
+        limited_client.get("/brands/1")
+    response = limited_client.get("/brands/1")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests, try again later"}
+    assert response.headers["RateLimit-Remaining"] == "0"
+    assert response.headers["Retry-After"] == "30"
+    assert REGISTRY.get_sample_value("http_requests_rate_limited_total", {"route": "/brands/{brand_id}"}) >= 1
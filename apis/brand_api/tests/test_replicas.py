@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+
+from ..db import database
+from ..db.database import SessionLocal, engine, read_from_replica
+from ..db.models import Brand
+from ..utils.replicas import PRIMARY_UNTIL_HEADER, ReplicaRoutingMiddleware
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    # The primary itself behind a second engine, enough to tell which engine every statement went to
+    replica_engine = create_engine(engine.url)
+    monkeypatch.setattr(database, "replica_engines", [replica_engine])
+    yield replica_engine
+    replica_engine.dispose()
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.replicas
+def test_success_replica_routing(db_session, create_valid_brand, replica, sql_statements):
+    replica_statements = []
+    event.listen(replica, "before_cursor_execute", lambda *args: replica_statements.append(args[2]))
+    token = read_from_replica.set(True)
+    try:
+        with SessionLocal() as db, sql_statements() as primary_statements:
+            brand = db.query(Brand).one()
+            assert len(replica_statements) == 1
+            assert primary_statements == []
+            brand.city = "Porto"
+            db.commit()
+            assert len(replica_statements) == 1
+            assert any(statement.startswith("UPDATE brands") for statement in primary_statements)
+    finally:
+        read_from_replica.reset(token)
+    with SessionLocal() as db:
+        db.query(Brand).one()
+    assert len(replica_statements) == 1
+
+
+def replica_routing_client(**kwargs) -> TestClient:
+    small_app = FastAPI()
+    small_app.add_middleware(ReplicaRoutingMiddleware, **kwargs)
+    small_app.add_api_route("/", lambda: {"replica": read_from_replica.get()})
+    small_app.add_api_route("/", lambda: {"replica": read_from_replica.get()}, methods=["POST"])
+    return TestClient(small_app)
+
+
+@pytest.mark.replicas
+def test_success_replica_routing_pins_writers():
+    routing_client = replica_routing_client(pin_seconds=60)
+    assert routing_client.get("/").json() == {"replica": True}
+    response = routing_client.post("/")
+    assert response.json() == {"replica": False}
+    until = float(response.headers[PRIMARY_UNTIL_HEADER])
+    assert time.time() < until <= time.time() + 60
+    # The client keeps the cookie and sends it back
+    assert routing_client.get("/").json() == {"replica": False}
+    assert TestClient(routing_client.app).get("/", headers={PRIMARY_UNTIL_HEADER: str(until)}).json() == {
+        "replica": False
+    }
+
+
+@pytest.mark.replicas
+def test_success_replica_routing_pin_expires():
+    routing_client = replica_routing_client(pin_seconds=60)
+    assert routing_client.get("/", headers={PRIMARY_UNTIL_HEADER: str(time.time() - 1)}).json() == {"replica": True}
+    assert routing_client.get("/", headers={PRIMARY_UNTIL_HEADER: "soon"}).json() == {"replica": True}
@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import create_engine
+
+from ..db import database
+from ..db.database import engine
+from ..serve import options, pool_size, post_fork, worker_count
+
+
+# DEFAULT BEHAVIOUR
+@pytest.mark.serve
+def test_success_serve_workers(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert worker_count() >= 1
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert worker_count() == 3
+    assert options(3)["workers"] == 3
+    assert options(3)["preload_app"] is True
+
+
+@pytest.mark.serve
+@pytest.mark.parametrize("max_connections,workers,size", [("90", 4, 22), ("90", 1, 40), ("10", 16, 1)])
+def test_success_serve_pool_size(monkeypatch, max_connections, workers, size):
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", max_connections)
+    assert pool_size(workers) == size
+
+
+@pytest.mark.serve
+def test_success_serve_post_fork(monkeypatch):
+    # A second engine on the primary stands in for a replica
+    replica = create_engine(engine.url)
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    pools = [engine.pool, replica.pool]
+    post_fork(None, None)
+    assert engine.pool is not pools[0]
+    assert replica.pool is not pools[1]
+    replica.dispose()
@@ -4,8 +4,9 @@ import pytest
 from fastapi.testclient import TestClient
 
 from .. import schemas
+from ..crud import read_all_socials
 from ..main import app
-from .conftest import validate_ownership_keys, validate_timestamp_and_ownership
+from .conftest import model_json, validate_ownership_keys, validate_timestamp_and_ownership
 
 client = TestClient(app)
 
@@ -15,7 +16,7 @@ methods = [client.patch, client.delete]
 # DEFAULT BEHAVIOUR
 @pytest.mark.socials
 def test_success_socials_create(token_generator):
-    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
+    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-7[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
     response = client.post(
         "/socials",
         headers={"Authorization": "Bearer " + token_generator},
@@ -41,6 +42,13 @@ def test_success_socials_read(token_generator, create_valid_social):
     validate_timestamp_and_ownership(response.json()["socials"], "get")
 
 
+@pytest.mark.socials
+def test_success_socials_read_matches_response_model(db_session, token_generator, create_valid_social):
+    response = client.get("/socials", headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 200
+    assert response.content == model_json(schemas.ListOfSocials, socials=read_all_socials(db_session))
+
+
 # ERROR HANDLING
 @pytest.mark.socials
 def test_error_method_not_allowed():
@@ -1,3 +1,5 @@
+import csv
+import io
 from re import search
 from uuid import uuid4
 
@@ -5,10 +7,11 @@ import pytest
 from fastapi.testclient import TestClient
 
 from .. import schemas
+from ..crud import read_all_users
 from ..db.models import Role, User
 from ..main import app
 from ..utils.password_hash import verify_password
-from .conftest import validate_ownership_keys, validate_timestamp_and_ownership
+from .conftest import model_json, validate_ownership_keys, validate_timestamp_and_ownership
 
 client = TestClient(app)
 
@@ -21,7 +24,7 @@ methods_users_id = [client.post]
 @pytest.mark.user
 def test_success_user_creation(db_session, create_valid_role):
     role_id = db_session.query(Role).first().id
-    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
+    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-7[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
     response = client.post(
         "/signup",
         json={
@@ -44,7 +47,7 @@ def test_success_user_creation(db_session, create_valid_role):
 
 @pytest.mark.user
 def test_success_user_creation_without_email(db_session):
-    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
+    pattern = "^[a-f0-9]{8}-[a-f0-9]{4}-7[a-f0-9]{3}-[89aAbB][a-f0-9]{3}-[a-f0-9]{12}$"
     response = client.post("/signup", json={"username": "newUser", "password": "NewPassword1"})
     assert response.status_code == 201
     for res in response.json()["users"]:
@@ -179,6 +182,42 @@ def test_success_one_user_read_non_deleted(db_session, delete_user, token_genera
         assert res["deleted_by"] != None
 
 
+@pytest.mark.user
+def test_success_users_read_matches_response_model(db_session, token_generator, create_multiple_users, delete_user):
+    response = client.get(
+        "/users",
+        params={"show_deleted": True, "order_by": "username"},
+        headers={"Authorization": "Bearer " + token_generator},
+    )
+    assert response.status_code == 200
+    db_session.expire_all()
+    users = read_all_users(db_session, show_deleted=True, order_by="username")
+    assert response.content == model_json(schemas.ListOfUsers, users=users)
+
+
+@pytest.mark.user
+def test_success_users_read_csv(token_generator, create_multiple_users):
+    response = client.get(
+        "/users",
+        params={"order_by": "username"},
+        headers={"Authorization": "Bearer " + token_generator, "Accept": "text/csv"},
+    )
+    assert response.status_code == 200
+    reader = csv.DictReader(io.StringIO(response.text))
+    assert reader.fieldnames[:5] == ["id", "username", "info", "created_at", "updated_at"]
+    assert reader.fieldnames[5:8] == ["updated_by.id", "updated_by.username", "updated_by.info"]
+    rows = list(reader)
+    assert [row["username"] for row in rows] == ["validUser", "validUser1", "validUser2", "validUser3"]
+
+
+@pytest.mark.user
+def test_success_users_read_streamed(token_generator, create_multiple_users):
+    page = client.get("/users", headers={"Authorization": "Bearer " + token_generator})
+    response = client.get("/users", params={"stream": True}, headers={"Authorization": "Bearer " + token_generator})
+    assert response.status_code == 200
+    assert response.content == page.content
+
+
 # ERROR HANDLING
 @pytest.mark.user
 def test_error_method_not_allowed_users():
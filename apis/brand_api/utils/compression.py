@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+GZIP = "gzip"
+BROTLI = "br"
+
+# On equal quality brotli wins, it is smaller for the same CPU at the levels we use
+PREFERENCE = {BROTLI: 2, GZIP: 1}
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick the content coding to answer with from the Accept-Encoding header, None meaning identity."""
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    best, best_rank = None, (0.0, 0)
+    for encoding, preference in PREFERENCE.items():
+        rank = (qualities.get(encoding, wildcard), preference)
+        if rank[0] > 0 and rank > best_rank:
+            best, best_rank = encoding, rank
+    return best
+
+
+class CompressedBodies:
+    """A small LRU of compressed bodies keyed by a digest of the uncompressed ones, so a hot page is
+    compressed once and every later identical body only costs a hash."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+
+    def get(self, encoding: str, body: bytes, compress) -> bytes:
+        if self.maxsize <= 0:
+            return compress(encoding, body)
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self.entries.get(key)
+        if compressed is None:
+            compressed = self.entries[key] = compress(encoding, body)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return compressed
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, as negotiated from Accept-Encoding.
+
+    Bodies under `minimum_size` bytes, and responses that already have a Content-Encoding, are sent as they
+    are. Whole bodies go through `cache`, streamed ones are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_size: int = 128,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedBodies(cache_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            if encoding is not None:
+                await CompressionResponder(self, encoding, send)(scope, receive, self.app)
+                return
+        await self.app(scope, receive, send)
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == BROTLI:
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def compressor(self, encoding: str):
+        """A (process, finish) pair for a streamed body, flushing after every chunk so none is held back."""
+        if encoding == BROTLI:
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+        # wbits=31 writes the gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message | None = None
+        self.passthrough = False
+        self.stream = None
+
+    async def __call__(self, scope: Scope, receive: Receive, app: ASGIApp) -> None:
+        await app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the first body chunk tells us whether to compress
+            self.start_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                self.stream = self.middleware.compressor(self.encoding)
+            else:
+                body = self.middleware.cache.get(self.encoding, body, self.middleware.compress)
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start_message)
+            self.start_message = None
+            if self.stream is None:
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+        process, finish = self.stream
+        chunk = process(body)
+        if not more_body:
+            chunk += finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,67 @@
+import time
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..db.database import request_deadline
+from .metrics import match_route
+
+# Milliseconds a client is willing to wait, the deadline of its request is never later than this
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+def route_timeouts(value: str) -> dict[str, float]:
+    """Parse comma separated `route=milliseconds` pairs, such as "/brands/=2000,/brands/{brand_id}=500"."""
+    timeouts = {}
+    for pair in value.split(","):
+        if pair.strip():
+            route, _, timeout = pair.rpartition("=")
+            timeouts[route.strip()] = float(timeout)
+    return timeouts
+
+
+class DeadlineMiddleware:
+    """Give every request a deadline, after which Postgres cancels the statements it runs and it answers 504.
+
+    The deadline is `timeout_ms` after the request arrives, or the timeout of its route template in
+    `route_timeouts_ms`. An X-Request-Timeout header can bring it closer, never push it further. 0 means none.
+    It ends when the response starts, a 504 could not be sent anymore and a streamed body would be cut short instead.
+    """
+
+    def __init__(self, app: ASGIApp, timeout_ms: float = 30000, route_timeouts_ms: dict[str, float] | None = None):
+        self.app = app
+        self.timeout_ms = timeout_ms
+        self.route_timeouts_ms = route_timeouts_ms or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeout = self.timeout_of(scope)
+        if not timeout:
+            await self.app(scope, receive, send)
+            return
+        token = request_deadline.set(time.monotonic() + timeout / 1000)
+
+        async def send_without_deadline(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Seen by the body a StreamingResponse goes on producing in the task that sends this
+                request_deadline.set(None)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_without_deadline)
+        finally:
+            request_deadline.reset(token)
+
+    def timeout_of(self, scope: Scope) -> float:
+        timeout = self.timeout_ms
+        if self.route_timeouts_ms:
+            timeout = self.route_timeouts_ms.get(match_route(scope), timeout)
+        try:
+            requested = float(Headers(scope=scope).get(REQUEST_TIMEOUT_HEADER, 0))
+        except ValueError:
+            requested = 0
+        if requested > 0:
+            timeout = min(timeout, requested) if timeout else requested
+        return timeout
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from datetime import datetime
+from functools import cache
+from pathlib import Path
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+MIGRATIONS = Path(__file__).parents[1] / "db" / "migrations"
+
+# The last readiness computed and when, shared by every probe until it is READINESS_CACHE_SECONDS old
+last_readiness: dict | None = None
+last_checked = 0.0
+readiness_lock = threading.Lock()
+
+
+@cache
+def migration_heads() -> list[str]:
+    """The head revisions of the migrations shipped with this code, read once."""
+    # alembic is only needed here, no need to import it with the app
+    from alembic.script import ScriptDirectory
+
+    return sorted(ScriptDirectory(str(MIGRATIONS)).get_heads())
+
+
+def check_database(engine: Engine) -> tuple[dict, dict]:
+    """Check out a pooled connection to run a trivial statement, and read the revision the database is at."""
+    heads = migration_heads()
+    start = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            latency = (time.perf_counter() - start) * 1000
+            current = []
+            if connection.execute(text("SELECT to_regclass('alembic_version')")).scalar() is not None:
+                current = sorted(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    except Exception as exc:
+        return {"ok": False, "error": str(exc).splitlines()[0]}, {"ok": False, "head": heads, "current": None}
+    pool = engine.pool
+    database = {
+        "ok": True,
+        "latency_ms": round(latency, 1),
+        "pool": {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": max(pool.overflow(), 0)}
+        if hasattr(pool, "size")
+        else None,
+    }
+    return database, {"ok": current == heads, "head": heads, "current": current}
+
+
+def check_caches(app: FastAPI) -> dict:
+    openapi = hasattr(app.state, "openapi_body")
+    warm_up = getattr(app.state, "warm_up", None)
+    return {"ok": openapi and warm_up is not None, "openapi": openapi, "warm_up": warm_up}
+
+
+def readiness(app: FastAPI, engine: Engine) -> dict:
+    database, migrations = check_database(engine)
+    checks = {"database": database, "migrations": migrations, "caches": check_caches(app)}
+    return {"ready": all(check["ok"] for check in checks.values()), "checked_at": datetime.now(), "checks": checks}
+
+
+def cached_readiness(app: FastAPI, engine: Engine) -> dict:
+    """The readiness checked at most once every READINESS_CACHE_SECONDS (default 2), however often it is probed."""
+    global last_readiness, last_checked
+    with readiness_lock:
+        if last_readiness is None or time.monotonic() - last_checked >= float(os.getenv("READINESS_CACHE_SECONDS", 2)):
+            last_readiness = readiness(app, engine)
+            last_checked = time.monotonic()
+        return last_readiness
@@ -0,0 +1,135 @@
+import os
+import threading
+import tracemalloc
+import weakref
+from collections import Counter, OrderedDict
+from datetime import datetime
+from itertools import count
+
+from prometheus_client import Gauge
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+ORM_SESSIONS = Gauge("orm_sessions_live", "Sessions that began a transaction and were not garbage collected yet")
+ORM_INSTANCES = Gauge("orm_identity_map_instances", "ORM instances held in the identity maps of live sessions")
+ORM_INSTANCES_MAX = Gauge("orm_identity_map_instances_max", "ORM instances held by the fullest live session")
+
+# Allocations made by tracemalloc itself or by imports would only hide the ones we are looking for
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+# Taken snapshots by id, oldest first, the oldest dropped past TRACEMALLOC_SNAPSHOTS (default 5)
+snapshots: OrderedDict[int, tuple[datetime, tracemalloc.Snapshot]] = OrderedDict()
+snapshot_ids = count(1)
+
+live_sessions: weakref.WeakSet[Session] = weakref.WeakSet()
+live_sessions_lock = threading.Lock()
+
+
+def start_tracing(frames: int) -> dict:
+    """Start tracing allocations, keeping `frames` frames of traceback for each. Restarts if already tracing."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(frames)
+    return tracing_status()
+
+
+def stop_tracing() -> dict:
+    """Stop tracing allocations. Snapshots already taken are kept."""
+    tracemalloc.stop()
+    return tracing_status()
+
+
+def tracing_status() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else None,
+        "traced_size": current,
+        "traced_peak": peak,
+        "snapshots": [snapshot_info(snapshot_id) for snapshot_id in snapshots],
+    }
+
+
+def snapshot_info(snapshot_id: int) -> dict:
+    taken_at, snapshot = snapshots[snapshot_id]
+    statistics = snapshot.statistics("filename")
+    return {
+        "id": snapshot_id,
+        "taken_at": taken_at,
+        "size": sum(statistic.size for statistic in statistics),
+        "count": sum(statistic.count for statistic in statistics),
+    }
+
+
+def take_snapshot() -> dict | None:
+    """Snapshot the traced allocations, None when tracemalloc is not tracing."""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot_id = next(snapshot_ids)
+    snapshots[snapshot_id] = (datetime.now(), tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS))
+    while len(snapshots) > int(os.getenv("TRACEMALLOC_SNAPSHOTS", 5)):
+        snapshots.popitem(last=False)
+    return snapshot_info(snapshot_id)
+
+
+def format_traceback(traceback: tracemalloc.Traceback) -> list[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+def top_allocations(snapshot_id: int, key_type: str, limit: int) -> list[dict] | None:
+    """The allocation sites holding the most memory in a snapshot, None if there is no such snapshot."""
+    if snapshot_id not in snapshots:
+        return None
+    _, snapshot = snapshots[snapshot_id]
+    return [
+        {"traceback": format_traceback(statistic.traceback), "size": statistic.size, "count": statistic.count}
+        for statistic in snapshot.statistics(key_type)[:limit]
+    ]
+
+
+def diff_allocations(snapshot_id: int, base_id: int, key_type: str, limit: int) -> list[dict] | None:
+    """The allocation sites that grew or shrank the most from snapshot `base_id` to `snapshot_id`, None if either
+    does not exist."""
+    if snapshot_id not in snapshots or base_id not in snapshots:
+        return None
+    _, snapshot = snapshots[snapshot_id]
+    _, base = snapshots[base_id]
+    return [
+        {
+            "traceback": format_traceback(statistic.traceback),
+            "size": statistic.size,
+            "size_diff": statistic.size_diff,
+            "count": statistic.count,
+            "count_diff": statistic.count_diff,
+        }
+        for statistic in snapshot.compare_to(base, key_type)[:limit]
+    ]
+
+
+def track_session(session: Session, transaction, connection) -> None:
+    with live_sessions_lock:
+        live_sessions.add(session)
+
+
+def session_instances() -> list[Counter[str]]:
+    """The ORM instances in the identity map of every live session, counted by class."""
+    with live_sessions_lock:
+        sessions = list(live_sessions)
+    # Identity maps change under us while other threads load rows, a copy of the states is enough to count
+    return [Counter(state.class_.__name__ for state in list(session.identity_map.all_states())) for session in sessions]
+
+
+def track_sessions() -> None:
+    """Keep track of every session that begins a transaction, to expose how many ORM instances they hold."""
+    event.listen(Session, "after_begin", track_session)
+    ORM_SESSIONS.set_function(lambda: len(live_sessions))
+    ORM_INSTANCES.set_function(lambda: sum(sum(instances.values()) for instances in session_instances()))
+    ORM_INSTANCES_MAX.set_function(
+        lambda: max((sum(instances.values()) for instances in session_instances()), default=0)
+    )
@@ -0,0 +1,171 @@
+import os
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from anyio.to_thread import current_default_thread_limiter
+from fastapi import Request
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .logging import logger
+from .warmup import is_warm_up
+
+REQUESTS = Counter("http_requests_total", "Requests served", ["method", "route", "status"])
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent serving a request", ["method", "route", "status"]
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed while serving a request",
+    ["method", "route"],
+    buckets=[0, 1, 2, 3, 5, 10, 20, 50, 100, 250],
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent in the database while serving a request", ["method", "route"]
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed")
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Time spent executing one SQL statement")
+REPEATED_STATEMENTS = Counter(
+    "http_request_repeated_statements_total",
+    "Requests that ran one statement shape often enough to look like N+1",
+    ["method", "route"],
+)
+THREADPOOL_SIZE = Gauge("threadpool_size", "Threads available to run sync endpoints and dependencies")
+THREADPOOL_IN_USE = Gauge("threadpool_in_use", "Threads currently running sync endpoints and dependencies")
+DB_POOL_SIZE = Gauge("db_pool_size", "Connections the pool keeps open")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out of the pool")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open over the pool size")
+
+# Routes that did not match anything share one label, so unknown paths can not blow up the label set
+UNMATCHED = "unmatched"
+
+
+@dataclass
+class RequestStats:
+    """What the database did for the request being served."""
+
+    # The ASGI scope, where routing leaves the matched route
+    scope: dict = field(default_factory=dict)
+    queries: int = 0
+    db_duration: float = 0.0
+    # Statement text, with parameters still as placeholders, so every run of one query has the same shape
+    statements: StatementCounter[str] = field(default_factory=StatementCounter)
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def route_of(scope: dict) -> str:
+    return scope["route"].path if "route" in scope else UNMATCHED
+
+
+def match_route(scope: dict) -> str | None:
+    """The template of the route a request is for, for middlewares that run before the routing does."""
+    for route in scope["app"].routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return None
+
+
+def current_route() -> str | None:
+    """The route template of the request being served, if any."""
+    stats = request_stats.get()
+    return None if stats is None else f"{stats.scope['method']} {route_of(stats.scope)}"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(duration)
+    # Sync endpoints run in the threadpool with a copy of the request context, which still holds the same stats
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_duration += duration
+        stats.statements[statement] += 1
+
+
+def instrument_engine(engine: Engine, pool_metrics: bool = True) -> None:
+    """Count and time every statement `engine` runs, and expose the saturation of its pool unless `pool_metrics` is
+    False, for replicas whose pools would overwrite the primary's."""
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    # Pools without a size, like NullPool, have nothing to report
+    if pool_metrics and hasattr(engine.pool, "size"):
+        DB_POOL_SIZE.set_function(engine.pool.size)
+        DB_POOL_CHECKED_OUT.set_function(engine.pool.checkedout)
+        DB_POOL_OVERFLOW.set_function(lambda: max(engine.pool.overflow(), 0))
+
+
+class MetricsMiddleware:
+    """Count and time every request by method, route template and status, with the database work it caused.
+
+    The database and application time also go out to the client in a Server-Timing header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or is_warm_up(scope):
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Streamed bodies keep querying after this, so for them it is the time to the first byte
+                total = (time.perf_counter() - start) * 1000
+                db = stats.db_duration * 1000
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", f"db;dur={db:.1f}, app;dur={total - db:.1f}, total;dur={total:.1f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            request_stats.reset(token)
+            route = route_of(scope)
+            method = scope["method"]
+            REQUESTS.labels(method, route, status).inc()
+            REQUEST_DURATION.labels(method, route, status).observe(duration)
+            REQUEST_DB_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_DB_DURATION.labels(method, route).observe(stats.db_duration)
+            log_repeated_statements(method, route, stats)
+
+
+def log_repeated_statements(method: str, route: str, stats: RequestStats) -> None:
+    """Warn about statement shapes run N_PLUS_ONE_THRESHOLD times or more in one request, a likely N+1."""
+    threshold = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+    repeated = {statement: count for statement, count in stats.statements.items() if count >= threshold}
+    if not repeated:
+        return
+    REPEATED_STATEMENTS.labels(method, route).inc()
+    for statement, count in repeated.items():
+        logger.warning(f"Possible N+1 on {method} {route}, ran {count} times: {' '.join(statement.split())}")
+
+
+async def metrics(request: Request) -> Response:
+    # Read on the event loop, the only place the default thread limiter can be reached from
+    limiter = current_default_thread_limiter()
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+    THREADPOOL_IN_USE.set(limiter.borrowed_tokens)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
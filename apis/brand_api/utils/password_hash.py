@@ -1,11 +1,17 @@
-from passlib.context import CryptContext
+from functools import cache
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@cache
+def password_context():
+    # passlib and bcrypt are slow to import, and only the routes that hash or check a password need them
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def get_hashed_password(password: str) -> str:
-    return password_context.hash(password)
+    return password_context().hash(password)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return password_context.verify(password, hashed_password)
+    return password_context().verify(password, hashed_password)
@@ -0,0 +1,159 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PACKAGE = "apis.brand_api"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv("PROFILE_DIR", "/tmp/brand_api_profiles"))
+
+
+def list_profiles() -> list[dict]:
+    """The stored profiles, newest first."""
+    paths = sorted(profile_dir().glob("*.speedscope.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    return [
+        {
+            "id": path.name.removesuffix(".speedscope.json"),
+            "size": path.stat().st_size,
+            **json.loads(path.read_bytes())["meta"],
+        }
+        for path in paths
+    ]
+
+
+def profile_path(profile_id: str) -> Path | None:
+    path = profile_dir() / f"{profile_id}.speedscope.json"
+    # Ids are uuid hex, anything else could step out of the store
+    return path if profile_id.isalnum() and path.is_file() else None
+
+
+def store_profile(profile_id: str, profile: dict) -> None:
+    """Write a profile to PROFILE_DIR, dropping the oldest ones past PROFILE_STORE_SIZE (default 20)."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile_id}.speedscope.json").write_text(json.dumps(profile))
+    paths = sorted(directory.glob("*.speedscope.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in paths[int(os.getenv("PROFILE_STORE_SIZE", 20)) :]:
+        path.unlink(missing_ok=True)
+
+
+class Sampler(threading.Thread):
+    """Sample the stacks of every thread running code from this package, every `interval` seconds.
+
+    Sync endpoints run on whichever threadpool thread is free, so rather than following one thread, any stack that
+    goes through the package is kept. Requests running at the same time on this worker show up too.
+    """
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.frames: dict[tuple[str, str, int], int] = {}
+        self.samples: dict[int, list[list[int]]] = {}
+        self.start_time = self.end_time = 0.0
+
+    def run(self) -> None:
+        self.start_time = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != self.ident:
+                    self.sample(thread_id, frame)
+        self.end_time = time.perf_counter()
+
+    def sample(self, thread_id: int, frame) -> None:
+        stack = []
+        in_package = False
+        while frame is not None:
+            code = frame.f_code
+            in_package = in_package or frame.f_globals.get("__name__", "").startswith(PACKAGE)
+            key = (code.co_name, code.co_filename, frame.f_lineno)
+            stack.append(self.frames.setdefault(key, len(self.frames)))
+            frame = frame.f_back
+        if in_package:
+            self.samples.setdefault(thread_id, []).append(stack[::-1])
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+    def speedscope(self, name: str, meta: dict) -> dict:
+        frames = [{"name": function, "file": file, "line": line} for function, file, line in self.frames]
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": PACKAGE,
+            "meta": meta,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_names.get(thread_id, str(thread_id)),
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.end_time - self.start_time,
+                    "samples": samples,
+                    "weights": [self.interval] * len(samples),
+                }
+                for thread_id, samples in self.samples.items()
+            ],
+        }
+
+
+class ProfilingMiddleware:
+    """Profile requests sent with an `X-Profile: 1` header by an admin, into a speedscope file in PROFILE_DIR.
+
+    The id to download it with goes back in an `X-Profile-Id` header. Requests without the header only pay for
+    looking it up.
+    """
+
+    def __init__(self, app: ASGIApp, is_admin) -> None:
+        self.app = app
+        self.is_admin = is_admin
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (b"x-profile", b"1") not in scope["headers"]:
+            await self.app(scope, receive, send)
+            return
+        authorization = Headers(scope=scope).get("authorization", "")
+        # Checking the token takes the database, keep it off the event loop
+        if not authorization.startswith("Bearer ") or not await run_in_threadpool(
+            self.is_admin, authorization.removeprefix("Bearer ")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = Sampler(float(os.getenv("PROFILE_INTERVAL_MS", 2)) / 1000)
+        profile_id = uuid4().hex
+        started_at = datetime.now()
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            name = f"{scope['method']} {scope['path']}"
+            if scope.get("query_string"):
+                name += f"?{scope['query_string'].decode()}"
+            meta = {
+                "request": name,
+                "started_at": started_at.isoformat(),
+                "duration": sampler.end_time - sampler.start_time,
+            }
+            await run_in_threadpool(store_profile, profile_id, sampler.speedscope(name, meta))
@@ -0,0 +1,159 @@
+import math
+import multiprocessing
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import match_route
+from .warmup import is_warm_up
+
+# The routes anyone can call without a token, so the ones a scraper goes for, and the ones that hash passwords
+DEFAULT_RATE_LIMITS = "/login=10/60,/signup=5/60,/brands/=120/60,/categories/=120/60,/brands/{brand_id}/socials/=120/60"
+
+RATE_LIMIT_HEADERS = ("RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After")
+REQUESTS_LIMITED = Counter("http_requests_rate_limited_total", "Requests answered with a 429 by route", ["route"])
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Up to `requests` at once, refilled at `requests` every `seconds`."""
+
+    requests: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.seconds
+
+    def refill(self, tokens: float, updated: float, now: float) -> float:
+        """The tokens of a bucket that held `tokens` at `updated`, full if it was never used."""
+        return self.requests if not updated else min(self.requests, tokens + (now - updated) * self.rate)
+
+
+def rate_limits(value: str) -> dict[str, RateLimit]:
+    """Parse comma separated `route=requests/seconds` pairs, such as "/login=10/60,/brands/=120/60"."""
+    limits = {}
+    for pair in value.split(","):
+        if pair.strip():
+            route, _, limit = pair.rpartition("=")
+            requests, _, seconds = limit.partition("/")
+            limits[route.strip()] = RateLimit(int(requests), float(seconds))
+    return limits
+
+
+class LocalBuckets:
+    """The token buckets of one worker, dropping the least recently used past `size` keys. A dropped bucket was
+    refilling anyway, the worst it does is start full again."""
+
+    def __init__(self, size: int = 10000) -> None:
+        self.size = size
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, limit: RateLimit, now: float) -> tuple[bool, float]:
+        """Take a token from the bucket of `key` if it has one. Returns whether it had, and the tokens left."""
+        tokens = limit.refill(*self.buckets.get(key, (0.0, 0.0)), now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = tokens, now
+        self.buckets.move_to_end(key)
+        if len(self.buckets) > self.size:
+            self.buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class SharedBuckets:
+    """Token buckets in memory shared with every worker forked after they are made, so a limit holds across all of
+    them rather than in each.
+
+    There is a fixed number of `slots` and every key hashes to one, clients whose keys share a slot share a bucket.
+    That is rare with enough slots, and only ever makes the limit stricter for them.
+    """
+
+    def __init__(self, slots: int = 65536) -> None:
+        self.slots = slots
+        # The tokens and the time they were counted at, for every slot
+        self.values = multiprocessing.RawArray("d", 2 * slots)
+        self.lock = multiprocessing.Lock()
+
+    def take(self, key: str, limit: RateLimit, now: float) -> tuple[bool, float]:
+        # crc32 rather than hash(), which is salted differently in every process not forked from this one
+        slot = 2 * (zlib.crc32(key.encode()) % self.slots)
+        with self.lock:
+            tokens = limit.refill(self.values[slot], self.values[slot + 1], now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.values[slot], self.values[slot + 1] = tokens, now
+        return allowed, tokens
+
+
+def client_of(scope: Scope) -> str:
+    """The subject of a valid bearer token, so users behind one address get a bucket each, or the client address."""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        # jose is slow to import, so it waits until the first token is checked
+        from jose import jwt
+
+        try:
+            return "sub:" + jwt.decode(token, os.getenv("JWT_SECRET_KEY"), algorithms=os.getenv("ALGORITHM"))["sub"]
+        except (jwt.JWTError, KeyError):
+            pass
+    return "ip:" + (scope["client"][0] if scope.get("client") else "unknown")
+
+
+def rate_limit_headers(limit: RateLimit, tokens: float) -> dict[str, str]:
+    return {
+        "RateLimit-Limit": str(limit.requests),
+        "RateLimit-Remaining": str(math.floor(tokens)),
+        "RateLimit-Reset": str(math.ceil((limit.requests - tokens) / limit.rate)),
+        "RateLimit-Policy": f"{limit.requests};w={limit.seconds:g}",
+    }
+
+
+class RateLimitMiddleware:
+    """Limit the requests every client sends to each route template in `limits` with a token bucket, answering a
+    429 with a Retry-After header once it is empty. Every limited response carries RateLimit-* headers.
+
+    The buckets are kept by each worker, unless `buckets` is SharedBuckets made before the workers are forked.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, RateLimit], buckets: LocalBuckets | SharedBuckets | None = None):
+        self.app = app
+        self.limits = limits
+        self.buckets = buckets or LocalBuckets()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.limits or is_warm_up(scope):
+            await self.app(scope, receive, send)
+            return
+        route = match_route(scope)
+        limit = self.limits.get(route)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        allowed, tokens = self.buckets.take(f"{route} {client_of(scope)}", limit, time.monotonic())
+        headers = rate_limit_headers(limit, tokens)
+        if not allowed:
+            REQUESTS_LIMITED.labels(route).inc()
+            response = JSONResponse(
+                {"detail": "Too many requests, try again later"},
+                status_code=429,
+                headers=headers | {"Retry-After": str(math.ceil((1 - tokens) / limit.rate))},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
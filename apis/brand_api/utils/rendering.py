@@ -0,0 +1,143 @@
+import csv
+import io
+from collections.abc import Iterable
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+
+import orjson
+import ormsgpack
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CSV = "text/csv"
+
+# Accept media ranges we can honour, and what they are served as.
+MEDIA_TYPES = {
+    JSON: JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    CSV: CSV,
+    "text/*": CSV,
+}
+
+# Rows fetched per round trip from the cursor, and bytes buffered before a chunk is sent, when streaming
+STREAM_YIELD_PER = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Documents the extra representations on the list routes, next to the JSON response_model.
+LIST_RESPONSES = {200: {"content": {MSGPACK: {}, CSV: {}}}}
+
+
+def negotiate(request: Request) -> str:
+    """Pick the media type to answer with from the Accept header, JSON being the default."""
+    best, best_rank = JSON, (0.0, False)
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # On equal quality, a specific media type wins over a wildcard
+        rank = (quality, "*" not in media_type)
+        if media_type in MEDIA_TYPES and quality > 0 and rank > best_rank:
+            best, best_rank = MEDIA_TYPES[media_type], rank
+    return best
+
+
+@lru_cache
+def _csv_columns(model: type[BaseModel], prefix: str = "") -> tuple[str, ...]:
+    columns = []
+    for name, field in model.__fields__.items():
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            columns += _csv_columns(field.type_, f"{prefix}{name}.")
+        else:
+            columns.append(f"{prefix}{name}")
+    return tuple(columns)
+
+
+def _csv_cells(row: dict, prefix: str = ""):
+    for key, value in row.items():
+        if isinstance(value, dict):
+            yield from _csv_cells(value, f"{prefix}{key}.")
+        elif isinstance(value, datetime):
+            yield f"{prefix}{key}", value.isoformat()
+        elif isinstance(value, Enum):
+            yield f"{prefix}{key}", value.value
+        else:
+            yield f"{prefix}{key}", value
+
+
+def to_csv(model: type[BaseModel], content: dict) -> bytes:
+    """One line per row of the list in `content`, with nested objects flattened to dotted columns.
+
+    Only the first field of `model` is written, so sideloaded `included` objects are left out.
+    """
+    key = next(iter(model.__fields__))
+    rows = content[key]
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=_csv_columns(model.__fields__[key].type_), extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(dict(_csv_cells(row)) for row in rows)
+    return output.getvalue().encode()
+
+
+def render(request: Request, model: type[BaseModel], content: dict) -> Response:
+    """Encode `content`, already shaped like `model`, in the representation the client asked for."""
+    media_type = negotiate(request)
+    if media_type == MSGPACK:
+        body = ormsgpack.packb(content)
+    elif media_type == CSV:
+        body = to_csv(model, content)
+    else:
+        body = orjson.dumps(content)
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def _stream_json(key: str, rows: Iterable[dict]):
+    chunk = bytearray(b"{" + orjson.dumps(key) + b":[")
+    separator = b""
+    for row in rows:
+        chunk += separator + orjson.dumps(row)
+        separator = b","
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    yield bytes(chunk + b"]}")
+
+
+def _stream_csv(model: type[BaseModel], key: str, rows: Iterable[dict]):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=_csv_columns(model.__fields__[key].type_), extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(dict(_csv_cells(row)))
+        if output.tell() >= STREAM_CHUNK_SIZE:
+            yield output.getvalue().encode()
+            output.seek(0)
+            output.truncate()
+    yield output.getvalue().encode()
+
+
+def stream(request: Request, model: type[BaseModel], rows: Iterable[dict]) -> StreamingResponse:
+    """Like render, but encoding `rows` a chunk at a time as they are read, so memory does not grow with the page.
+
+    MessagePack needs the length of an array before its items, so it can not be streamed.
+    """
+    media_type = negotiate(request)
+    key = next(iter(model.__fields__))
+    if media_type == MSGPACK:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="Streamed pages are only available as JSON or CSV"
+        )
+    body = _stream_csv(model, key, rows) if media_type == CSV else _stream_json(key, rows)
+    return StreamingResponse(body, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,58 @@
+import math
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..db.database import SAFE_METHODS, read_from_replica
+
+# Sent back after every successful write, with the time until which the client reads from the primary
+PRIMARY_UNTIL_COOKIE = "primary_until"
+PRIMARY_UNTIL_HEADER = "X-Primary-Until"
+
+
+class ReplicaRoutingMiddleware:
+    """Let requests with a safe method read from a replica, unless their client wrote in the last `pin_seconds`.
+
+    A successful write answers with a cookie and a header holding the time its client stays pinned to the primary
+    until. Browsers send the cookie back on their own, other clients can send the header back instead, so they
+    always read their own writes even while the replicas catch up.
+    """
+
+    def __init__(self, app: ASGIApp, pin_seconds: float = 5) -> None:
+        self.app = app
+        self.pin_seconds = pin_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] in SAFE_METHODS:
+            token = read_from_replica.set(not self.pinned(scope))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                read_from_replica.reset(token)
+            return
+
+        async def send_with_pin(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + self.pin_seconds:.3f}"
+                headers = MutableHeaders(scope=message)
+                headers[PRIMARY_UNTIL_HEADER] = until
+                headers.append(
+                    "Set-Cookie",
+                    f"{PRIMARY_UNTIL_COOKIE}={until}; Max-Age={math.ceil(self.pin_seconds)}; Path=/; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
+
+    def pinned(self, scope: Scope) -> bool:
+        headers = Headers(scope=scope)
+        until = headers.get(PRIMARY_UNTIL_HEADER) or cookie_parser(headers.get("cookie", "")).get(PRIMARY_UNTIL_COOKIE)
+        try:
+            return until is not None and float(until) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+
+from anyio.to_thread import current_default_thread_limiter, run_sync
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .logging import logger
+
+LAG_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up the monitor, time it spent busy elsewhere",
+    buckets=LAG_BUCKETS,
+)
+THREADPOOL_QUEUE_WAIT = Histogram(
+    "threadpool_queue_wait_seconds", "How long a call waited for a free thread to run on", buckets=LAG_BUCKETS
+)
+THREADPOOL_WAITING = Gauge(
+    "threadpool_waiting", "Calls waiting for a free thread to run sync endpoints and dependencies"
+)
+REQUESTS_SHED = Counter("http_requests_shed_total", "Requests answered with a 503 because the threadpool was saturated")
+
+
+class SaturationMonitor:
+    """Measure event loop lag and threadpool queue wait every MONITOR_INTERVAL_MS milliseconds (default 100).
+
+    The loop lag is how late a sleep wakes up. The queue wait is how long a no-op takes to get a thread, the same wait
+    every request to a sync endpoint goes through before its handler starts.
+    """
+
+    def __init__(self) -> None:
+        self.task: asyncio.Task | None = None
+        self.probe: asyncio.Task | None = None
+        self.probe_started: float | None = None
+        self.queue_wait = 0.0
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        for task in (self.task, self.probe):
+            if task is not None:
+                task.cancel()
+        self.task = self.probe = None
+        self.probe_started = None
+        self.queue_wait = 0.0
+
+    async def run(self) -> None:
+        interval = float(os.getenv("MONITOR_INTERVAL_MS", 100)) / 1000
+        limiter = current_default_thread_limiter()
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = time.perf_counter() - start - interval
+            EVENT_LOOP_LAG.observe(max(lag, 0))
+            if lag > 0.1:
+                logger.warning(f"Event loop lagged {lag * 1000:.0f} ms")
+            THREADPOOL_WAITING.set(limiter.statistics().tasks_waiting)
+            # A probe still waiting for a thread is the measurement, no need to queue another behind it
+            if self.probe is None or self.probe.done():
+                self.probe = asyncio.create_task(self.probe_threadpool())
+
+    async def probe_threadpool(self) -> None:
+        self.probe_started = time.perf_counter()
+        await run_sync(lambda: None)
+        self.queue_wait = time.perf_counter() - self.probe_started
+        self.probe_started = None
+        THREADPOOL_QUEUE_WAIT.observe(self.queue_wait)
+
+    def current_queue_wait(self) -> float:
+        """The last queue wait measured, or how long the probe in flight has waited so far if that is longer."""
+        if self.probe_started is None:
+            return self.queue_wait
+        return max(self.queue_wait, time.perf_counter() - self.probe_started)
+
+    def overloaded(self, budget: float) -> bool:
+        """Whether calls are waiting for a thread and the wait is over `budget` seconds."""
+        waiting = current_default_thread_limiter().statistics().tasks_waiting
+        return waiting > 0 and self.current_queue_wait() > budget
+
+
+monitor = SaturationMonitor()
+
+
+class AdmissionMiddleware:
+    """Answer new requests right away with a 503 and a Retry-After header while the threadpool queue wait is over
+    `max_queue_wait_ms`, rather than queue them behind the others. Paths in `exempt` are always let through.
+
+    A `max_queue_wait_ms` of 0 turns it off.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_queue_wait_ms: float = 1000,
+        retry_after: int = 1,
+        exempt: tuple[str, ...] = (),
+        monitor: SaturationMonitor = monitor,
+    ) -> None:
+        self.app = app
+        self.budget = max_queue_wait_ms / 1000
+        self.retry_after = retry_after
+        self.exempt = exempt
+        self.monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and self.budget > 0
+            and scope["path"] not in self.exempt
+            and self.monitor.overloaded(self.budget)
+        ):
+            REQUESTS_SHED.inc()
+            response = JSONResponse(
+                {"detail": "The server is overloaded, try again later"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
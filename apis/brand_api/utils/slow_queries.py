@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .logging import logger
+from .metrics import current_route
+
+CRUD_MODULE = "apis.brand_api.crud"
+
+# The most recent slow statements, newest last, with the plan Postgres chose for each
+slow_queries: deque[dict] = deque(maxlen=int(os.getenv("SLOW_QUERY_LOG_SIZE", 50)))
+
+
+def parameter_shapes(parameters, executemany: bool):
+    """The type of every bound parameter, never its value."""
+    if executemany:
+        parameters = parameters[0] if parameters else {}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def crud_function() -> str | None:
+    """The crud function that ran the statement, found by walking up the stack.
+
+    Private helpers are skipped for the public function that called them, the one a router knows by name.
+    """
+    function = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get("__name__") == CRUD_MODULE:
+            function = frame.f_code.co_name
+            if not function.startswith(("_", "<")):
+                return function
+        frame = frame.f_back
+    return function
+
+
+def explain(conn, statement: str, parameters) -> list | str:
+    """EXPLAIN (FORMAT JSON) of a statement that already ran, on the same connection and parameters.
+
+    It only plans the statement, without running it again. A savepoint keeps a failing EXPLAIN from aborting the
+    transaction the statement belongs to.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    savepoint = not dbapi_connection.autocommit
+    cursor = dbapi_connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            ((plan,),) = cursor.fetchall()
+        except Exception as exc:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"EXPLAIN failed: {exc}"
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = (time.perf_counter() - conn.info["slow_query_start_time"].pop()) * 1000
+    threshold = float(os.getenv("SLOW_QUERY_MS", 500))
+    if duration < threshold:
+        return
+    route = current_route()
+    function = crud_function()
+    plan = None
+    if not executemany and statement.lstrip()[:6].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        plan = explain(conn, statement, parameters)
+    logger.warning(f"Slow query ({duration:.0f} ms) on {route} from crud.{function}: {' '.join(statement.split())}")
+    slow_queries.append(
+        {
+            "at": datetime.now(),
+            "duration_ms": round(duration, 1),
+            "route": route,
+            "crud_function": function,
+            "statement": statement,
+            "parameters": parameter_shapes(parameters, executemany),
+            "plan": plan,
+        }
+    )
+
+
+def log_slow_queries(engine: Engine) -> None:
+    """Log statements slower than SLOW_QUERY_MS milliseconds (default 500) and keep their plans in slow_queries."""
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
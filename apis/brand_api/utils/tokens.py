@@ -2,8 +2,6 @@ import os
 from datetime import datetime, timedelta
 from typing import Any
 
-from jose import jwt
-
 
 def create_access_token(subject: str | Any, expires_delta: timedelta | Any = None) -> str:
     if expires_delta is not None:
@@ -11,6 +9,9 @@ def create_access_token(subject: str | Any, expires_delta: timedelta | Any = Non
     else:
         expires_delta = datetime.utcnow() + timedelta(minutes=float(str(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))))
 
+    # jose is slow to import, so it waits until the first token is made
+    from jose import jwt
+
     to_encode = {"exp": expires_delta, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, os.getenv("JWT_SECRET_KEY"), os.getenv("ALGORITHM"))
     return encoded_jwt
@@ -22,6 +23,8 @@ def create_refresh_token(subject: str | Any, expires_delta: timedelta | Any = No
     else:
         expires_delta = datetime.utcnow() + timedelta(minutes=float(str(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES"))))
 
+    from jose import jwt
+
     to_encode = {"exp": expires_delta, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, os.getenv("JWT_REFRESH_SECRET_KEY"), os.getenv("ALGORITHM"))
     return encoded_jwt
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from contextlib import ExitStack
+
+from fastapi import FastAPI
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import configure_mappers
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Message, Scope
+
+from .logging import logger
+
+# The lookups and first list pages most clients start with. Requests carry no token, so only public routes warm up.
+WARMUP_PATHS = "/categories/,/brands/,/brands/?skip=100"
+# Every body is warmed for both encodings, so the first clients find their compressed pages cached too
+ENCODINGS = ("br", "gzip")
+
+
+def warm_pool(engine: Engine, connections: int) -> int:
+    """Open `connections` connections at once and give them back, so the pool keeps them open for the first
+    requests. Never more than the pool keeps, the rest would be closed right away, so none without a pool."""
+    connections = min(connections, engine.pool.size()) if hasattr(engine.pool, "size") else 0
+    with ExitStack() as stack:
+        for _ in range(connections):
+            stack.enter_context(engine.connect())
+    return connections
+
+
+def is_warm_up(scope: Scope) -> bool:
+    """Whether `scope` is a warm-up request, which the metrics and the rate limits leave out, not a client's."""
+    return scope.get("warm_up", False)
+
+
+async def warm_request(app: FastAPI, path: str, encoding: str) -> int:
+    """GET `path` through the whole app, without a socket, and return the status it answered with."""
+    path, _, query_string = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [(b"host", b"warmup"), (b"accept-encoding", encoding.encode())],
+        "client": None,
+        "server": None,
+        "warm_up": True,
+    }
+    received = False
+    status = 500
+
+    async def receive() -> Message:
+        nonlocal received
+        if received:
+            # Nobody disconnects, wait until the response is done and this is cancelled
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warm_up(app: FastAPI, engine: Engine) -> dict:
+    """Open WARMUP_CONNECTIONS pooled connections (default 5), configure the mappers and GET every path in
+    WARMUP_PATHS, so the first requests after a deploy find everything ready. The result is kept in app.state."""
+    start = time.perf_counter()
+    connections = await run_in_threadpool(warm_pool, engine, int(os.getenv("WARMUP_CONNECTIONS", 5)))
+    configure_mappers()
+    paths = [path.strip() for path in os.getenv("WARMUP_PATHS", WARMUP_PATHS).split(",") if path.strip()]
+    requests = {}
+    for path in paths:
+        for encoding in ENCODINGS:
+            requests[f"{path} ({encoding})"] = status = await warm_request(app, path, encoding)
+            if status != 200:
+                logger.warning(f"Warm-up GET {path} answered {status}")
+    app.state.warm_up = {
+        "connections": connections,
+        "requests": requests,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    logger.info(f"Warmed up in {app.state.warm_up['duration_ms']} ms")
+    return app.state.warm_up